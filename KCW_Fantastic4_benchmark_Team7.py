@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import random
+import resource
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple
+import KCW_Fantastic4_metrics_Team7 as metrics
+from KCW_Fantastic4_loader_Team7 import load_photos
+from KCW_Fantastic4_runner_Team7 import SOLVERS
+from KCW_Fantastic4_score_Team7 import score, validate
+
+
+class Profile(NamedTuple):
+    photos: int  # Photos in the real dataset
+    portraits: float  # Share of portrait photos
+    vocabulary: int  # Distinct tags
+    min_tags: int  # Tags per photo
+    max_tags: int
+
+
+# Shapes of the Kaggle datasets, keyed by the solver written for each of them
+PROFILES = {
+    "example": Profile(4, 0.5, 6, 2, 3),
+    "binary_landscapes": Profile(80000, 0.0, 840000, 18, 18),
+    "computable_moments": Profile(1000, 0.5, 2166, 1, 19),
+    "randomizing_paintings": Profile(90000, 0.5, 220, 2, 19),
+    "oily_portraits": Profile(80000, 0.625, 500, 15, 25),
+}
+
+
+def generate(profile: Profile, num_photos: int, seed: int, file_path: str):
+    """Write a seeded synthetic input with the shape of `profile`."""
+    rng = random.Random(seed)
+    vocabulary = range(profile.vocabulary)
+    portraits = [rng.random() < profile.portraits for _ in range(num_photos)]
+    if sum(portraits) % 2:  # Like the real inputs, every portrait has a partner
+        portraits[portraits.index(True)] = False
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as f:
+        f.write(f"{num_photos}\n")
+        for portrait in portraits:
+            photo_type = "P" if portrait else "L"
+            tags = rng.sample(vocabulary, rng.randint(profile.min_tags, profile.max_tags))
+            f.write(f"{photo_type} {len(tags)} {' '.join(f't{tag}' for tag in tags)}\n")
+
+
+def run_solver(solver: str, file_path: str, params: Dict) -> Dict:
+    """Child process: parse, solve and score one input. Each run gets a fresh process for its peak memory."""
+    record = {}
+    metrics.reset()
+    with metrics.phase("parse"):
+        data = load_photos(file_path)
+    start = time.time()
+    try:
+        slides, _ = SOLVERS[solver](data, params)
+    except Exception as error:
+        record["error"] = f"{type(error).__name__}: {error}"
+        return record
+    record["solve_time"] = solve_time = time.time() - start
+    record["peak_memory_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    evaluations = metrics.counters["candidates_scanned"]
+    record["interest_evaluations"] = evaluations
+    record["evaluations_per_second"] = evaluations / solve_time if solve_time else None
+    record.update(metrics.report())
+    first = np.array([a for a, _ in slides], dtype=np.int64)
+    second = np.array([b for _, b in slides], dtype=np.int64)
+    errors = validate(data, first, second, len(slides))
+    record["valid"] = not errors
+    record["errors"] = errors
+    record["score"] = score(data, first, second) if not errors else None
+    return record
+
+
+def benchmark(profiles, sizes, seed: int, workdir: str, params: Dict):
+    results = []
+    for name in profiles:
+        profile = PROFILES[name]
+        for size in sorted({min(size, profile.photos) for size in sizes}):
+            file_path = os.path.join(workdir, f"{name}_{size}_{seed}.txt")
+            if not os.path.exists(file_path):
+                generate(profile, size, seed, file_path)
+            # A spawned child, not a forked one: a fork's ru_maxrss would count the pages of this process too
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1) as pool:
+                record = pool.submit(run_solver, name, file_path, params.get(name, {})).result()
+            record.update(profile=name, photos=size, seed=seed)
+            results.append(record)
+            print(json.dumps(record))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the solvers on seeded synthetic inputs.")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[500, 2000, 8000], help="photo counts to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--params", default="{}", help='JSON of solver parameters, e.g. {"randomizing_paintings": {"accuracy": 500}}')
+    parser.add_argument("--workdir", default="./pycache/bench", help="where the synthetic inputs are kept")
+    parser.add_argument("-o", "--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    results = benchmark(args.profiles, args.sizes, args.seed, args.workdir, json.loads(args.params))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
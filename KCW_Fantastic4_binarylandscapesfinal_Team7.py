@@ -1,12 +1,15 @@
 import time
 from collections import defaultdict
+import KCW_Fantastic4_metrics_Team7 as metrics
+from KCW_Fantastic4_loader_Team7 import compact_tags, load_photos
+from KCW_Fantastic4_store_Team7 import photo_views
 
 # Constants
 INF = 99999999
 
 # Global variables
 adjIndex = []
-listPhoto = []
+photoData = None
 ensembleTags = {}
 photos = []
 indexPhotosH = []
@@ -15,16 +18,8 @@ alb = None
 
 # Function to read from the file
 def read_file(file_name):
-    global listPhoto
-    with open(file_name, 'r') as file:
-        listPhoto.clear()
-        num_photos = int(file.readline().strip())
-        for _ in range(num_photos):
-            data = file.readline().strip().split()
-            photo_type = data[0]
-            num_tags = int(data[1])
-            tags = data[2:]
-            listPhoto.append((photo_type, tags))
+    global photoData
+    photoData = load_photos(file_name)
 
 # Function to write the album to a file
 def write_album(file_name):
@@ -38,14 +33,13 @@ def write_album(file_name):
 
 # Initialize the tag hashing system
 def init_hash():
-    global ensembleTags
+    global ensembleTags, photoData
+    # Tags on a single photo only count towards its size: fold them into a private
+    # count and number the others by descending frequency
+    photoData = compact_tags(photoData)
     ensembleTags.clear()
-    key = 0
-    for _, tags in listPhoto:
-        for tag in tags:
-            if tag not in ensembleTags:
-                ensembleTags[tag] = key
-                key += 1
+    for key, tag in enumerate(photoData.tags.tolist()):
+        ensembleTags[tag] = key
 
 # Hash function for tags
 def hash_tag(tag):
@@ -74,20 +68,9 @@ def interest(tags1, tags2):
 # Create photos from the list of photo data
 def create_photos():
     global photos, indexPhotosH, indexPhotosV
-    photos.clear()
-    indexPhotosH.clear()
-    indexPhotosV.clear()
-    for idx, (photo_type, tags) in enumerate(listPhoto):
-        photo = {
-            'index': idx,
-            'type': photo_type,
-            'tags': sorted([hash_tag(tag) for tag in tags])
-        }
-        photos.append(photo)
-        if photo_type == 'H':
-            indexPhotosH.append(idx)
-        else:
-            indexPhotosV.append(idx)
+    photos = photo_views(photoData)
+    indexPhotosH[:] = [photo.index for photo in photos if photo.landscape]
+    indexPhotosV[:] = [photo.index for photo in photos if not photo.landscape]
 
 # Comparison function for sorting photos
 def compare_photo_inter(i, j):
@@ -95,81 +78,116 @@ def compare_photo_inter(i, j):
 
 # Function to solve the problem and create the album
 def solve():
-    init_hash()
-    create_photos()
-    num_tags = len(ensembleTags)
-    
+    with metrics.phase("hash"):
+        init_hash()
+        create_photos()
+    with metrics.phase("greedy"):
+        build_album()
+
+def build_album():
+    global adjIndex, alb
+    num_photos = len(indexPhotosH)
+
     ensemble_photos = defaultdict(list)
-    for i in indexPhotosH:
-        for tag in photos[i]['tags']:
+    for i, photo in enumerate(indexPhotosH):
+        for tag in photos[photo].tags.tolist():
             ensemble_photos[tag].append(i)
-    
-    # Create the graph of photo intersections
-    adjIndex.clear()
-    adjIndex = [[] for _ in range(len(indexPhotosH))]
+
+    # Create the graph of photo intersections, each neighbour once
+    adjIndex = [set() for _ in range(num_photos)]
     for tag in ensemble_photos.values():
-        for i in tag:
-            adjIndex[i].extend(tag)
-    
-    # Remove self references
-    for i in range(len(indexPhotosH)):
-        adjIndex[i] = [x for x in adjIndex[i] if x != i]
+        if len(tag) > 1:
+            for i in tag:
+                adjIndex[i].update(tag)
+    for i in range(num_photos):
+        adjIndex[i].discard(i)
+    neighbours = [list(adj) for adj in adjIndex]
+
+    # Bucket queue of the photos left to choose from, keyed by degree. Degrees only
+    # go down, so a photo is pushed again in its new bucket and the stale entry skipped
+    degree = [len(adj) for adj in adjIndex]
+    buckets = [[] for _ in range(max(degree, default=0) + 1)]
+    for i in reversed(range(num_photos)):
+        buckets[degree[i]].append(i)
+    done = [False] * num_photos
+    min_degree = 0
+
+    def unlink(i, k):
+        nonlocal min_degree
+        adjIndex[i].remove(k)
+        degree[i] -= 1
+        buckets[degree[i]].append(i)
+        min_degree = min(min_degree, degree[i])
+
+    # Solve by choosing photos and creating the album: the photo with the fewest
+    # neighbours left is linked to its lowest-index neighbour
+    path = [-1] * num_photos
+    progress = metrics.Progress("Chaining", num_photos)
+    for step in range(num_photos):
+        progress.update(step)
+        while True:
+            while not buckets[min_degree]:
+                min_degree += 1
+            j = buckets[min_degree].pop()
+            if not done[j] and degree[j] == min_degree:
+                break
+        done[j] = True
+        if degree[j] == 0:
+            continue
+        k = min(adjIndex[j])
+        path[j] = k
+        # k now has a predecessor: it must not point back to j, and no other photo may choose it
+        if j in adjIndex[k]:
+            unlink(k, j)
+        for i in neighbours[k]:
+            if not done[i] and k in adjIndex[i]:
+                unlink(i, k)
+    progress.close()
 
-    # Sort photos based on the number of intersecting tags
-    indexPhotosH.sort(key=lambda x: len(adjIndex[x]))
-    
-    # Solve by choosing photos and creating the album
-    path = [-1] * len(indexPhotosH)
-    for i in range(len(indexPhotosH)):
-        j = indexPhotosH[i]
-        if len(adjIndex[j]) > 0:
-            v = sorted(adjIndex[j])
-            k = v[0]
-            path[j] = k
-            adjIndex[k].remove(j)
-            for idx in range(i + 1, len(indexPhotosH)):
-                adjIndex[indexPhotosH[idx]].remove(k)
-            indexPhotosH.sort(key=lambda x: len(adjIndex[x]))
-    
     # Create the album from the chosen path
-    inverse_path = [-2] * len(indexPhotosH)
+    inverse_path = [-2] * num_photos
     fin_path = []
-    for i in range(len(indexPhotosH)):
+    for i in range(num_photos):
         if path[i] == -1:
             fin_path.append(i)
         else:
             inverse_path[path[i]] = i
-    
-    global alb
-    alb = {'index': [], 'score': 0}
-    used = [False] * len(indexPhotosH)
-    
+
+    order = []
+    used = [False] * num_photos
+
     # Process the final path
     for i in fin_path:
         j = i
         while j >= 0 and not used[j]:
-            alb['index'].append((j, -1))
+            order.append(j)
             used[j] = True
             j = inverse_path[j]
-    
-    for i in range(len(indexPhotosH)):
+
+    for i in range(num_photos):
         j = i
         while j >= 0 and not used[j]:
-            alb['index'].append((j, -1))
+            order.append(j)
             used[j] = True
             j = inverse_path[j]
 
+    alb = {'index': [(indexPhotosH[j], -1) for j in order], 'score': 0}
+    for a, b in zip(order, order[1:]):
+        photo_a, photo_b = photos[indexPhotosH[a]], photos[indexPhotosH[b]]
+        intersection = length_intersection(sorted(photo_a.tags.tolist()), sorted(photo_b.tags.tolist()))
+        alb['score'] += min(photo_a.size - intersection, photo_b.size - intersection, intersection)
+
 # Main function
 def main():
     start_time = time.time()
-    print("Reading from file...")
-    read_file("input/1_binary_landscapes.txt")
+    metrics.report_at_exit("output/metrics_1_binary_landscapes.json")
+    with metrics.phase("parse"):
+        read_file("input/1_binary_landscapes.txt")
     
-    print("Solving the problem...")
     solve()
     
-    print("Writing to file...")
-    write_album("output/1_binary_landscapes.txt")
+    with metrics.phase("write"):
+        write_album("output/1_binary_landscapes.txt")
     
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -0,0 +1,78 @@
+import numpy as np
+from typing import List, Tuple
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from KCW_Fantastic4_loader_Team7 import PhotoData
+from KCW_Fantastic4_scoring_Team7 import row_offsets
+
+
+def tag_components(data: PhotoData) -> Tuple[int, np.ndarray]:
+    """Number of components of the tag graph, and the component of every photo.
+
+    Photos are joined when they share a tag. The components are those of the
+    bipartite photo-tag graph, restricted to the photos: a tag links all the
+    photos of its postings at once.
+    """
+    num_photos, num_tags = len(data), len(data.tags)
+    photo = np.repeat(np.arange(num_photos), np.diff(data.offsets))
+    tag_ids = np.asarray(data.tag_ids, dtype=np.int64)
+    graph = csr_matrix((np.ones(len(photo), dtype=np.int8), (photo, num_photos + tag_ids)),
+                       shape=(num_photos + num_tags, num_photos + num_tags))
+    _, labels = connected_components(graph, directed=False)
+    # Renumber the labels of the photos densely; tags never seen on a photo drop out
+    components, labels = np.unique(labels[:num_photos], return_inverse=True)
+    return len(components), labels
+
+
+def subset(data: PhotoData, rows: np.ndarray) -> PhotoData:
+    """The photos `rows` of `data` as a dataset of their own; photo k of it is photo rows[k]. Tag ids are kept."""
+    rows = np.asarray(rows, dtype=np.int64)
+    photo, tag_ids = data.gather(rows)
+    offsets = row_offsets(photo, len(rows))
+    private = None if data.private is None else np.asarray(data.private)[rows]
+    return PhotoData(offsets, tag_ids, np.asarray(data.landscape)[rows], data.tags, private)
+
+
+def split_components(data: PhotoData, min_size: int = 1000) -> List[np.ndarray]:
+    """Photo ids of independent sub-problems: the tag components, the small ones batched together.
+
+    Slides made within different components share no tag, so no order between
+    them scores. The split is over photos, though: portraits of different
+    batches are never paired, and such a slide, carrying the tags of two
+    components, could have scored on both sides. Components below `min_size`
+    photos are merged, smallest first, into batches of at least that size, so
+    the pool is not flooded with tiny jobs. A batch with an odd number of
+    portraits gives its portrait with the fewest tags to a last group of
+    leftovers, which are paired among themselves. With an odd number of
+    portraits in all, the leftover with the fewest tags is dropped, as a
+    solver on the whole input would leave one portrait out too.
+    """
+    count, labels = tag_components(data)
+    order = np.argsort(labels, kind="stable")
+    groups = np.split(order, np.cumsum(np.bincount(labels, minlength=count))[:-1])
+    groups.sort(key=len)
+    batches, batch, size = [], [], 0
+    for group in groups:
+        batch.append(group)
+        size += len(group)
+        if size >= min_size:
+            batches.append(np.concatenate(batch))
+            batch, size = [], 0
+    if batch:
+        batches.append(np.concatenate(batch))
+
+    portrait = ~np.asarray(data.landscape)
+    sizes = data.sizes
+    leftovers = []
+    for k, rows in enumerate(batches):
+        portraits = rows[portrait[rows]]
+        if len(portraits) % 2:
+            extra = portraits[np.argmin(sizes[portraits])]
+            leftovers.append(extra)
+            batches[k] = rows[rows != extra]
+    leftovers = np.asarray(leftovers, dtype=np.int64)
+    if len(leftovers) % 2:
+        leftovers = np.delete(leftovers, np.argmin(sizes[leftovers]))
+    if len(leftovers):
+        batches.append(leftovers)
+    return [rows for rows in batches if len(rows)]
@@ -1,16 +1,21 @@
 import random
-import copy
 import os
 import sys
+import numpy as np
+from collections import defaultdict
+import KCW_Fantastic4_metrics_Team7 as metrics
+from KCW_Fantastic4_loader_Team7 import load_photos
+from KCW_Fantastic4_score_Team7 import score as scoreSlideshow
+from KCW_Fantastic4_scoring_Team7 import InterestScorer, NextSlideSearch
 
 
 class Photo:
-    def __init__(self, id, line):
-        param = line.split(" ")
+    __slots__ = ("id", "isHorizontal", "tags")
+
+    def __init__(self, id, isHorizontal, tags):
         self.id = id
-        self.isHorizontal = True if param[0] == "L" else False
-        tags_unstripped = param[2::]
-        self.tags = set([x.strip() for x in tags_unstripped])
+        self.isHorizontal = isHorizontal
+        self.tags = set(tags)
 
     def pointsTo(self, slide):
         intersection = len(self.tags & slide.tags)
@@ -26,6 +31,8 @@ class Photo:
 
 
 class Slide:
+    __slots__ = ("photo1_n", "photo2_n", "tags", "points", "isHorizontal")
+
     def __init__(self, photo):
         self.photo1_n = photo.id
         self.photo2_n = None
@@ -38,7 +45,8 @@ class Slide:
             print("Cannot pair an landscape photo in a dataframe with a portrait one")
         else:
             self.photo2_n = photo.id
-            self.tags.update(photo.tags)
+            # A new set: the slide's tags start out as the first photo's own set
+            self.tags = self.tags | photo.tags
 
     def previewPointsTo(self, photo, slide):
         prev_tags = self.tags.union(photo.tags)
@@ -72,11 +80,6 @@ class Slide:
         return line
 
 
-def printPercentage(slides_processed, elements):
-    perc = 100 * slides_processed / elements
-    print("{:.2f}%".format(perc), end="\r", flush=True)
-
-
 def calculateScore(slideshow):
     points = 0
     for i in range(0, len(slideshow) - 1):
@@ -105,101 +108,193 @@ def recreateSolution(solutionFile, photos):
     return slideshow
 
 
-def generatePhotoList(file):
-    photos = []
-    lineNumber = 0
-    for line in file:
-        if lineNumber != 0:
-            photos.append(Photo(lineNumber - 1, line))
-        lineNumber += 1
-    return photos
+def generatePhotoList(fileName):
+    return photosFromData(load_photos(fileName))
+
+
+def photosFromData(data):
+    return [Photo(i, isHorizontal, tags)
+            for i, (isHorizontal, tags) in enumerate(zip(data.landscape.tolist(), data.photo_tags()))]
+
+
+class PhotoPool:
+    """Handles (rows) of the photos left to place, removed by swapping with the last one."""
+
+    def __init__(self, handles, capacity):
+        self.items = np.asarray(handles, dtype=np.int64)
+        self.size = len(self.items)
+        self.slot = np.full(capacity, -1, dtype=np.int64)
+        self.slot[self.items] = np.arange(self.size)
+
+    def __len__(self):
+        return self.size
+
+    def handles(self):
+        return self.items[:self.size]
+
+    def remove(self, handle):
+        k = self.slot[handle]
+        last = self.items[self.size - 1]
+        self.items[k] = last
+        self.slot[last] = k
+        self.slot[handle] = -1
+        self.size -= 1
+
 
+def generateSlideshow(photos, seed=None, lsh=None):
+    with metrics.phase("greedy"):
+        return buildSlideshow(photos, seed, lsh)
+
+
+def buildSlideshow(photos, seed=None, lsh=None):
+    # Rows follow the sorted order, so the first best row is the photo the list scan would pick
+    rng = None
+    if seed is not None:
+        # Shuffled before the sort, so ties are ranked at random
+        rng = random.Random(seed)
+        photos = list(photos)
+        rng.shuffle(photos)
+    rows = sorted(photos, key=lambda x: len(x.tags))
+    elements = len(rows)
+    scorer = InterestScorer(x.tags for x in rows)
+    search = NextSlideSearch(scorer, lsh)
+    horizontal = PhotoPool([row for row, x in enumerate(rows) if x.isHorizontal], elements)
+    vertical = PhotoPool([row for row, x in enumerate(rows) if not x.isHorizontal], elements)
+
+    def place(row):
+        (horizontal if rows[row].isHorizontal else vertical).remove(row)
+        search.remove(row)
 
-def generateSlideshow(photos_toCopy):
-    photos = copy.deepcopy(photos_toCopy)
-    photos.sort(key=lambda x: len(x.tags))
-    elements = len(photos)
     slideshow = []
-    last = None
-    for photo in photos:
-        if photo.isHorizontal:
-            last = Slide(photos.pop(photos.index(photo)))
-            photos_processed = 1
-            break
-    if last is None:
-        last = Slide(photos.pop(0))
-        last.addVertical(photos.pop(0))
+    if len(horizontal):
+        row = int(horizontal.handles()[0])  # Nothing was removed yet, so this is the lowest row
+        if rng is not None:
+            row = int(horizontal.handles()[rng.randrange(len(horizontal))])
+        last = Slide(rows[row])
+        place(row)
+        photos_processed = 1
+    else:
+        first, second = (0, 1) if rng is None else rng.sample(range(elements), 2)
+        last = Slide(rows[first])
+        last.addVertical(rows[second])
+        place(first)
+        place(second)
         photos_processed = 2
     slideshow.append(last)
-    while photos:
-        printPercentage(photos_processed, elements)
-        points = -1
-        selected = None
-        for p in photos:
-            new_points = last.pointsTo(p)
-            if new_points > points:
-                points = new_points
-                selected = p
-        if selected:
-            last = Slide(photos.pop(photos.index(selected)))
-            if selected.isHorizontal:
-                photos_processed += 1
-            else:
-                match = None
-                best_delta = -1000
-                for p in [x for x in photos if not x.isHorizontal]:
-                    new_points = last.previewPointsTo(p, slideshow[-1])
-                    delta = new_points - points
-                    if delta > best_delta:
-                        best_delta = delta
-                        match = p
-                if match:
-                    points += best_delta
-                    last.addVertical(photos.pop(photos.index(match)))
-                    photos_processed += 2
-            slideshow[-1].points = points
-            slideshow.append(last)
-    print("       ", end="\r")
+    progress = metrics.Progress("Slideshow", elements)
+    while len(horizontal) + len(vertical):
+        progress.update(photos_processed)
+        row, points = search.best(last.tags)
+        selected = rows[row]
+        last = Slide(selected)
+        place(row)
+        if selected.isHorizontal:
+            photos_processed += 1
+        else:
+            candidates = vertical.handles()
+            if len(candidates):
+                previews = scorer.union_scores(last.tags, slideshow[-1].tags, candidates)
+                points = int(previews.max())
+                # The pool is unordered: take the lowest best row, as a scan in row order would
+                match = int(candidates[previews == points].min())
+                last.addVertical(rows[match])
+                place(match)
+                photos_processed += 2
+        slideshow[-1].points = points
+        slideshow.append(last)
+    progress.close()
     return slideshow
 
 
-def improveSolution(slideshow):
-    elements = (len(slideshow)) * (len(slideshow) - 1) / 2
+def improveSolution(slideshow, maxCandidates=100):
+    """One relocation pass: move each slide next to the tag-sharing slide where it gains most.
+
+    The slideshow is kept as next/prev index arrays, with edge[k] the cached
+    score from slide k to the one after it, so a move costs O(1) and its delta
+    is computed from cached edges plus the three new ones.
+    """
+    with metrics.phase("improve"):
+        return relocateSlides(slideshow, maxCandidates)
+
+
+def relocateSlides(slideshow, maxCandidates):
     size = len(slideshow)
-    slides_processed = 0
-    slideshow.reverse()
-    for i in range(1, size):
-        slideshow[i-1].points = slideshow[i-1].pointsTo(slideshow[i])
-    for i in range(0, size-1):
-        current = slideshow[i]
-        current_score = current.points
-        if i > 0 and slideshow[i-1] is not None:
-            current_score += slideshow[i-1].points
-        higher_delta = 0
-        candidate_insert = i
-        best_points1 = 0
-        best_points2 = 0
-        for j in range(i+1, size-1):
-            if slides_processed % 10000 == 0:
-                printPercentage(slides_processed, elements)
-            slides_processed += 1
-            pts1 = current.pointsTo(slideshow[j])
-            pts2 = current.pointsTo(slideshow[j+1])
-            previous_score = slideshow[j].points
-            new_score = pts1 + pts2
-            delta = (new_score - previous_score) - current_score
-            if delta > higher_delta:
-                higher_delta = delta
-                candidate_insert = j+1
-                best_points1 = pts1
-                best_points2 = pts2
-        if candidate_insert != i:
-            slideshow[i] = None
-            slideshow.insert(candidate_insert, current)
-            slideshow[candidate_insert-1].points = best_points1
-            slideshow[candidate_insert].points = best_points2
-        print("", end="\r")
-    return [x for x in slideshow if x is not None]
+    if size < 3:
+        return slideshow
+    nxt = list(range(1, size)) + [-1]
+    prv = [-1] + list(range(size - 1))
+    edge = [slideshow[k].pointsTo(slideshow[k + 1]) for k in range(size - 1)] + [0]
+    head = 0
+    postings = defaultdict(list)
+    for k, slide in enumerate(slideshow):
+        for tag in slide.tags:
+            postings[tag].append(k)
+
+    def points(a, b):
+        return slideshow[a].pointsTo(slideshow[b]) if a != -1 and b != -1 else 0
+
+    progress = metrics.Progress("Improving", size)
+    for s in range(size):
+        progress.update(s)
+        p, q = prv[s], nxt[s]
+        removal = points(p, q) - edge[s] - (edge[p] if p != -1 else 0)
+        # Rarest tags first: their slides are the likeliest to score, and the pool is full sooner
+        candidates = set()
+        for tag in sorted(slideshow[s].tags, key=lambda t: len(postings[t])):
+            for c in postings[tag]:
+                if c != s:
+                    candidates.add(c)
+                    if len(candidates) >= maxCandidates:
+                        break
+            if len(candidates) >= maxCandidates:
+                break
+        metrics.count("index_hits", len(candidates))
+        best_delta = 0
+        best_position = None
+        for c in candidates:
+            pts = points(c, s)
+            if pts == 0:
+                continue  # Only slides that score with s are tried as its neighbour
+            if c != p:
+                # Between c and the slide after it
+                delta = removal + pts + points(s, nxt[c]) - edge[c]
+                if delta > best_delta:
+                    best_delta, best_position = delta, (c, nxt[c])
+            if c != q:
+                # Between the slide before c and c
+                a = prv[c]
+                delta = removal + pts + (points(a, s) - edge[a] if a != -1 else 0)
+                if delta > best_delta:
+                    best_delta, best_position = delta, (a, c)
+        if best_position is None:
+            continue
+        # Unlink s, then link it between a and b
+        if p != -1:
+            nxt[p] = q
+            edge[p] = points(p, q)
+        else:
+            head = q
+        if q != -1:
+            prv[q] = p
+        a, b = best_position
+        prv[s], nxt[s] = a, b
+        if a != -1:
+            nxt[a] = s
+            edge[a] = points(a, s)
+        else:
+            head = s
+        if b != -1:
+            prv[b] = s
+        edge[s] = points(s, b)
+    progress.close()
+
+    improved = []
+    k = head
+    while k != -1:
+        slideshow[k].points = edge[k]
+        improved.append(slideshow[k])
+        k = nxt[k]
+    return improved
 
 
 def main_run():
@@ -218,18 +313,22 @@ def main_run():
     if not os.path.exists(folder):
         os.makedirs(folder)
     inputName = inputFileNames[letter]
+    metrics.report_at_exit(f"{folder}/metrics_{inputName}.json")
     try:
-        with open(f"inputs/{inputName}.txt", "r") as inputFile:
-            photos = generatePhotoList(inputFile)
+        with metrics.phase("parse"):
+            data = load_photos(f"inputs/{inputName}.txt")
+            photos = photosFromData(data)
     except IOError:
         print(f"!!! {inputName}.txt NOT FOUND IN INPUT FOLDER !!!")
         exit()
 
     slideshow = generateSlideshow(photos)
-    score = sum(x.points for x in slideshow[:-2])
+    first = np.array([slide.photo1_n for slide in slideshow], dtype=np.int64)
+    second = np.array([-1 if slide.photo2_n is None else slide.photo2_n for slide in slideshow], dtype=np.int64)
+    score = scoreSlideshow(data, first, second)
     print(f"Found solution with score {score}.")
     outputFileName = f"{folder}/{inputName}_out_{score}.txt"
-    with open(outputFileName, "w") as out:
+    with metrics.phase("write"), open(outputFileName, "w") as out:
         out.write(str(len(slideshow)) + "\n")
         for slide in slideshow:
             out.write(str(slide) + "\n")
@@ -245,11 +344,12 @@ def improve_run():
     k = filePath.rfind("/")
     folder = filePath[:k]
     inputName = inputFileNames[filePath[k+1:k+2]]
+    metrics.report_at_exit(f"{folder}/metrics_{inputName}_improve.json")
     try:
-        with open(f"inputs/{inputName}.txt", "r") as inputFile:
-            photos = generatePhotoList(inputFile)
-        with open(filePath, "r") as solutionFile:
-            slideshow = recreateSolution(solutionFile, photos)
+        with metrics.phase("parse"):
+            photos = generatePhotoList(f"inputs/{inputName}.txt")
+            with open(filePath, "r") as solutionFile:
+                slideshow = recreateSolution(solutionFile, photos)
     except IOError:
         print("!!! NO INPUT WITH THAT NAME IN INPUT FOLDER !!!")
         exit()
@@ -259,7 +359,7 @@ def improve_run():
     score = calculateScore(slideshow)
     print(f"Improved score from {old_score} to {score}.")
     outputFileName = f"{folder}/{inputName}_out_{score}.txt"
-    with open(outputFileName, "w") as out:
+    with metrics.phase("write"), open(outputFileName, "w") as out:
         generateOutputFile(out, slideshow)
 
 
@@ -1,24 +1,20 @@
 import time
-from collections import defaultdict
-from typing import List, Tuple
+import numpy as np
+import KCW_Fantastic4_metrics_Team7 as metrics
+from KCW_Fantastic4_loader_Team7 import load_photos
+from KCW_Fantastic4_scoring_Team7 import InterestScorer
+from KCW_Fantastic4_store_Team7 import photo_views
 
 INF = 99999999
 bestMaxTest = 1000
 
-# List of photos in file format
-listPhoto = []
+# Parsed input file (flat tag id arrays)
+photoData = None
 
 # Hash set of tags
 ensembleTags = {}
 
-# Define the Photo class
-class Photo:
-    def __init__(self, index: int, type: str, tags: List[str]):
-        self.index = index
-        self.type = type
-        self.tags = [ensembleTags.get(tag, -1) for tag in tags]
-
-# List of photos (horizontal and vertical)
+# List of photos (horizontal and vertical), as views on photoData
 photos = []
 indexPhotosH = []
 indexPhotosV = []
@@ -32,15 +28,15 @@ class Slideshow:
         
         if photo:
             self.index1 = photo.index
-            self.tags.update(photo.tags)
+            self.tags.update(photo.tags.tolist())
             
         if photo2:
             self.index2 = photo2.index
-            self.tags.update(photo2.tags)
+            self.tags.update(photo2.tags.tolist())
 
     def add(self, photo):
         self.index2 = photo.index
-        self.tags.update(photo.tags)
+        self.tags.update(photo.tags.tolist())
 
 # Album class
 class Album:
@@ -66,18 +62,15 @@ class Album:
 def initHache():
     global ensembleTags
     ensembleTags.clear()
-    key = 0
-    for photo in listPhoto:
-        for tag in photo[1]:
-            if tag not in ensembleTags:
-                ensembleTags[tag] = key
-                key += 1
+    # The loader already interned the tags, in order of first appearance
+    for key, tag in enumerate(photoData.tags.tolist()):
+        ensembleTags[tag] = key
 
 def hacher(tag: str) -> int:
     return ensembleTags.get(tag, -1)
 
 def comparPhotoSize(i: int, j: int) -> bool:
-    return len(listPhoto[i][1]) < len(listPhoto[j][1])
+    return len(photos[i].tags) < len(photos[j].tags)
 
 # Function to calculate the intersection length
 def lenghtIntersection(v1: set, v2: set) -> int:
@@ -92,33 +85,30 @@ def interest(s1: set, s2: set) -> int:
 
 def createPhotos():
     global photos, indexPhotosH, indexPhotosV
-    photos.clear()
-    indexPhotosH.clear()
-    indexPhotosV.clear()
-    
-    for i, (type, tags) in enumerate(listPhoto):
-        photo = Photo(i, type, tags)
-        photos.append(photo)
-        if type == 'L':
-            indexPhotosH.append(i)
-        else:
-            indexPhotosV.append(i)
+    photos = photo_views(photoData)
+    indexPhotosH[:] = [photo.index for photo in photos if photo.landscape]
+    indexPhotosV[:] = [photo.index for photo in photos if not photo.landscape]
 
 # Function to calculate penalty
 def penality(s1: Slideshow, s2: Slideshow) -> int:
     return -interest(s1.tags, s2.tags)
 
+# Function to pick a portrait pair for one end of the album: the best first
+# portrait against the end slide, then the best partner for that portrait.
+# Both are single batch scorings, instead of trying every pair
+def bestVerticalPair(scorerV: InterestScorer, aliveV: np.ndarray, slide: Slideshow):
+    rows = np.flatnonzero(aliveV)
+    if len(rows) < 2:
+        return None
+    first = int(rows[np.argmax(scorerV.scores(slide.tags, rows))])
+    rows = rows[rows != first]
+    partners = scorerV.union_scores(photos[indexPhotosV[first]].tags, slide.tags, rows)
+    best = int(np.argmax(partners))
+    return int(partners[best]), first, int(rows[best])
+
 def readFile(namefile: str):
-    global listPhoto
-    with open(namefile, 'r') as file:
-        listPhoto.clear()
-        numPhotos = int(file.readline().strip())
-        for _ in range(numPhotos):
-            line = file.readline().strip().split()
-            photo_type = line[0]
-            numTags = int(line[1])
-            tags = line[2:]
-            listPhoto.append((photo_type, tags))
+    global photoData
+    photoData = load_photos(namefile)
 
 def writeAlbum(namefile: str, alb: Album):
     with open(namefile, 'w') as file:
@@ -131,12 +121,15 @@ def writeAlbum(namefile: str, alb: Album):
 
 # Main solve function
 def solve():
-    initHache()
-    print("Creating Photos...")
-    createPhotos()
-    print("Sorting Photos by Size...")
-    indexPhotosH.sort(key=lambda x: len(listPhoto[x][1]))
-    indexPhotosV.sort(key=lambda x: len(listPhoto[x][1]))
+    with metrics.phase("hash"):
+        initHache()
+        createPhotos()
+    with metrics.phase("greedy"):
+        return buildAlbum()
+
+def buildAlbum():
+    indexPhotosH.sort(key=lambda x: len(photos[x].tags))
+    indexPhotosV.sort(key=lambda x: len(photos[x].tags))
 
     numberPhotoH = len(indexPhotosH)
     numberPhotoV = len(indexPhotosV)
@@ -144,7 +137,11 @@ def solve():
 
     slides = [None] * (2 * numberSlides)
     notUseIndexH = set(range(numberPhotoH))
+    scorerH = InterestScorer(photos[i].tags.tolist() for i in indexPhotosH)
+    aliveH = np.ones(numberPhotoH, dtype=bool)
     notUseIndexV = set(range(numberPhotoV))
+    scorerV = InterestScorer(photos[i].tags.tolist() for i in indexPhotosV)
+    aliveV = np.ones(numberPhotoV, dtype=bool)
 
     left = numberSlides
     right = numberSlides
@@ -152,6 +149,7 @@ def solve():
     if numberPhotoH > 0:
         slides[left] = Slideshow(photos[indexPhotosH[0]])
         notUseIndexH.remove(0)
+        aliveH[0] = False
     else:
         minPenality = INF
         indexPhoto = -1
@@ -163,60 +161,65 @@ def solve():
         slides[left] = Slideshow(photos[indexPhotosV[indexPhoto]], photos[indexPhotosV[0]])
         notUseIndexV.remove(indexPhoto)
         notUseIndexV.remove(0)
+        aliveV[[indexPhoto, 0]] = False
     
+    progress = metrics.Progress("Creating Album", numberSlides)
     for i in range(1, numberSlides):
+        progress.update(i)
         minPenality = INF
         indexPhoto = -1
         isleft = False
         isV = False
-        for j in notUseIndexH:
-            newSlide = Slideshow(photos[indexPhotosH[j]])
-            p = penality(slides[left], newSlide)
-            if p < minPenality:
+        if notUseIndexH:
+            # Score every remaining landscape against both ends at once; ties go to
+            # the lowest index, and to the left end for the same index
+            interestLeft = np.where(aliveH, scorerH.scores(slides[left].tags), -1)
+            interestRight = np.where(aliveH, scorerH.scores(slides[right].tags), -1)
+            jLeft = int(np.argmax(interestLeft))
+            jRight = int(np.argmax(interestRight))
+            bestLeft = int(interestLeft[jLeft])
+            bestRight = int(interestRight[jRight])
+            if bestLeft > bestRight or (bestLeft == bestRight and jLeft <= jRight):
                 isleft = True
-                minPenality = p
-                indexPhoto = j
-                slides[left-1] = newSlide
-            p = penality(slides[right], newSlide)
-            if p < minPenality:
-                isleft = False
-                minPenality = p
-                indexPhoto = j
-                slides[right+1] = newSlide
-
-        for j1 in notUseIndexV:
-            for j2 in notUseIndexV:
-                if j1 == j2: break
+                minPenality = -bestLeft
+                indexPhoto = jLeft
+                slides[left-1] = Slideshow(photos[indexPhotosH[jLeft]])
+            else:
+                minPenality = -bestRight
+                indexPhoto = jRight
+                slides[right+1] = Slideshow(photos[indexPhotosH[jRight]])
+
+        for end in (left, right):
+            pair = bestVerticalPair(scorerV, aliveV, slides[end])
+            if pair is None:
+                break
+            p, j1, j2 = pair
+            if -p < minPenality:
+                isV = True
+                isleft = end == left
+                minPenality = -p
+                indexPhoto = j1
+                indexPhoto2 = j2
                 newSlide = Slideshow(photos[indexPhotosV[j1]], photos[indexPhotosV[j2]])
-                p = penality(slides[left], newSlide)
-                if p < minPenality:
-                    isV = True
-                    isleft = True
-                    minPenality = p
-                    indexPhoto = j1
-                    indexPhoto2 = j2
+                if isleft:
                     slides[left-1] = newSlide
-                p = penality(slides[right], newSlide)
-                if p < minPenality:
-                    isV = True
-                    isleft = False
-                    minPenality = p
-                    indexPhoto = j1
-                    indexPhoto2 = j2
+                else:
                     slides[right+1] = newSlide
 
         if isV:
             notUseIndexV.remove(indexPhoto)
             notUseIndexV.remove(indexPhoto2)
+            aliveV[[indexPhoto, indexPhoto2]] = False
         else:
             notUseIndexH.remove(indexPhoto)
+            aliveH[indexPhoto] = False
 
         if isleft:
             left -= 1
         else:
             right += 1
     
-    print("Creating Album...")
+    progress.close()
     alb = Album(slides, left, right)
     return alb
 
@@ -225,12 +228,13 @@ def get_time_in_ms():
 
 def main():
     current_time = get_time_in_ms()
+    metrics.report_at_exit("outputs/metrics_0_example.json")
     print("****** Test 1 *******")
-    print("Reading from file...")
-    readFile("inputs/0_example.txt")
+    with metrics.phase("parse"):
+        readFile("inputs/0_example.txt")
     alb = solve()  # Capture the return value of solve() here
-    print("Writing to file outputs/output_0_example.txt...")
-    writeAlbum("outputs/output_0_example.txt", alb)
+    with metrics.phase("write"):
+        writeAlbum("outputs/output_0_example.txt", alb)
     print(f"End of 0_example.txt Score is {alb.score}")
     
     difference1 = get_time_in_ms() - current_time
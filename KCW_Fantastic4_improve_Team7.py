@@ -0,0 +1,156 @@
+import os
+import time
+import argparse
+import numpy as np
+from typing import List, Optional
+import KCW_Fantastic4_metrics_Team7 as metrics
+from KCW_Fantastic4_ledger_Team7 import ScoreLedger
+from KCW_Fantastic4_scoring_Team7 import InterestScorer
+from KCW_Fantastic4_computablemomentsfinal_Team7 import generatePhotoList, recreateSolution, calculateScore, generateOutputFile
+
+MAX_SEGMENT = 3  # Longest segment moved by Or-opt
+MAX_POOL = 2000  # Candidate slides looked at per slide when building neighbour lists
+
+
+class Tour(ScoreLedger):
+    """Slide order of a slideshow on a score ledger, scored with Slide.pointsTo."""
+
+    def __init__(self, slideshow):
+        self.slides = slideshow
+        super().__init__(len(slideshow), lambda a, b: slideshow[a].pointsTo(slideshow[b]))
+
+    def slideshow(self):
+        for position, k in enumerate(self.order):
+            self.slides[k].points = self.edge[position]
+        return [self.slides[k] for k in self.order]
+
+
+class NeighbourLists:
+    """Top-k tag-sharing neighbours of every slide, by transition score.
+
+    A slide's list is built the first time it is asked for, so building them
+    runs inside the optimizer's time budget.
+    """
+
+    def __init__(self, slideshow, k: int):
+        self.slideshow = slideshow
+        self.k = k
+        self.scorer = InterestScorer(slide.tags for slide in slideshow)
+        matrix = self.scorer.matrix.tocsc()
+        self.postings = np.split(matrix.indices, matrix.indptr[1:-1])
+        self.lists: List[Optional[List[int]]] = [None] * len(slideshow)
+
+    def __getitem__(self, row: int) -> List[int]:
+        if self.lists[row] is None:
+            self.lists[row] = self._build(row)
+        return self.lists[row]
+
+    def _build(self, row: int) -> List[int]:
+        slide, postings = self.slideshow[row], self.postings
+        # Rarest tags first: they say the most about a slide
+        tag_ids = sorted((self.scorer.vocabulary[tag] for tag in slide.tags), key=lambda t: len(postings[t]))
+        pool = []
+        size = 0
+        for tag_id in tag_ids:
+            pool.append(postings[tag_id][:MAX_POOL - size])
+            size += len(pool[-1])
+            if size >= MAX_POOL:
+                break
+        rows = np.unique(np.concatenate(pool)) if pool else np.empty(0, dtype=np.int32)
+        rows = rows[rows != row]
+        if len(rows) == 0:
+            return []
+        scores = self.scorer.scores(slide.tags, rows)
+        top = np.argsort(-scores, kind="stable")[:self.k]
+        return [int(rows[i]) for i in top if scores[i] > 0]
+
+
+def two_opt(tour: Tour, a: int, b: int) -> bool:
+    """Try the reversals that make slides a and b adjacent."""
+    i, j = tour.pos[a], tour.pos[b]
+    if abs(i - j) < 2:
+        return False
+    if i > j:
+        i, j = j, i
+    for left, right in ((i + 1, j), (i, j - 1)):
+        if tour.reverse_delta(left, right) > 0:
+            tour.reverse(left, right)
+            return True
+    return False
+
+
+def or_opt(tour: Tour, a: int, b: int) -> bool:
+    """Try moving a short segment that ends at slide a next to slide b."""
+    i, j = tour.pos[a], tour.pos[b]
+    size = len(tour)
+    for length in range(1, MAX_SEGMENT + 1):
+        # Segment starting at a: a lands after b, or (reversed) before it
+        # Segment ending at a: a lands before b, or (reversed) after it
+        for start, a_first in ((i, True), (i - length + 1, False)):
+            end = start + length - 1
+            if start < 0 or end >= size or start <= j <= end:
+                continue
+            for after, reverse in ((j, not a_first), (j - 1, a_first)):
+                if start - 1 <= after <= end:
+                    continue
+                if tour.move_delta(start, length, after, reverse) > 0:
+                    tour.move(start, length, after, reverse)
+                    return True
+            if length == 1:
+                break
+    return False
+
+
+def improve(slideshow, budget: float, k: int = 10):
+    """2-opt and Or-opt over top-k neighbour lists until no move helps or the budget runs out."""
+    deadline = time.monotonic() + budget
+    tour = Tour(slideshow)
+    neighbours = NeighbourLists(slideshow, k)
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for a in range(len(tour)):
+            if a % 256 == 0 and time.monotonic() >= deadline:
+                break
+            for b in neighbours[a]:
+                if two_opt(tour, a, b) or or_opt(tour, a, b):
+                    improved = True
+    return tour.slideshow()
+
+
+def write_atomic(file_path: str, slideshow):
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w") as out:
+        generateOutputFile(out, slideshow)
+    os.replace(tmp_path, file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Improve a slideshow solution with 2-opt and Or-opt moves.")
+    parser.add_argument("input", help="input photo file")
+    parser.add_argument("solution", help="solution file to improve")
+    parser.add_argument("-o", "--output", help="where to write the improved solution (default: <solution>_improved.txt)")
+    parser.add_argument("-t", "--budget", type=float, default=60.0, help="wall-clock budget in seconds")
+    parser.add_argument("-k", "--neighbours", type=int, default=10, help="neighbours tried per slide")
+    parser.add_argument("--report", help="write phase timings and counters to this JSON file at exit")
+    args = parser.parse_args()
+    if args.report:
+        metrics.report_at_exit(args.report)
+
+    with metrics.phase("parse"):
+        photos = generatePhotoList(args.input)
+        with open(args.solution, "r") as solutionFile:
+            slideshow = recreateSolution(solutionFile, photos)
+    old_score = calculateScore(slideshow)
+    with metrics.phase("improve"):
+        slideshow = improve(slideshow, args.budget, args.neighbours)
+    score = calculateScore(slideshow)
+    print(f"Improved score from {old_score} to {score}.")
+
+    output = args.output or os.path.splitext(args.solution)[0] + "_improved.txt"
+    with metrics.phase("write"):
+        write_atomic(output, slideshow)
+
+
+if __name__ == "__main__":
+    main()
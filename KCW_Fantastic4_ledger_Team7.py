@@ -0,0 +1,165 @@
+from typing import Callable
+
+# Transition score between two slides, given by their index
+Points = Callable[[int, int], int]
+
+
+class ScoreLedger:
+    """Slide order with the score of every transition kept up to date.
+
+    edge[k] is the score between the slides at positions k and k + 1 (0 for
+    the last position) and `total` is their sum. Each move has a delta query
+    that only scores the transitions it breaks and creates, and an apply
+    method that rewrites those edges in place, so the score of the show is
+    never recomputed from scratch.
+    """
+
+    def __init__(self, size: int, points: Points):
+        self._points = points
+        self.order = list(range(size))
+        self.pos = list(range(size))
+        self.edge = [points(k, k + 1) for k in range(size - 1)] + [0] * min(size, 1)
+        self.total = sum(self.edge)
+
+    def __len__(self):
+        return len(self.order)
+
+    def points(self, a: int, b: int) -> int:
+        if a < 0 or b < 0:
+            return 0
+        return self._points(a, b)
+
+    def at(self, position: int) -> int:
+        return self.order[position] if 0 <= position < len(self.order) else -1
+
+    def edge_at(self, position: int) -> int:
+        return self.edge[position] if 0 <= position < len(self.order) else 0
+
+    def score(self) -> int:
+        return self.total
+
+    def _relink(self, lo: int, hi: int, old: int):
+        """Refresh pos over lo..hi and the edges entering and leaving the range; old is the previous sum of edge[lo-1..hi]."""
+        order, edge = self.order, self.edge
+        for position in range(lo, hi + 1):
+            self.pos[order[position]] = position
+        if lo > 0:
+            edge[lo - 1] = self.points(order[lo - 1], order[lo])
+        edge[hi] = self.points(order[hi], self.at(hi + 1))
+        self.total += sum(edge[max(lo - 1, 0):hi + 1]) - old
+
+    def reverse_delta(self, left: int, right: int) -> int:
+        """Gain of reversing positions left..right."""
+        old = self.edge_at(left - 1) + self.edge_at(right)
+        new = self.points(self.at(left - 1), self.at(right)) + self.points(self.at(left), self.at(right + 1))
+        return new - old
+
+    def reverse(self, left: int, right: int):
+        if left >= right:
+            return  # Nothing to reverse; the slices below would wrap around to the whole list
+        order, edge = self.order, self.edge
+        old = sum(edge[max(left - 1, 0):right + 1])
+        order[left:right + 1] = order[right:left - 1 if left else None:-1]
+        edge[left:right] = edge[right - 1:left - 1 if left else None:-1]
+        self._relink(left, right, old)
+
+    def removal_delta(self, start: int, length: int) -> int:
+        """Gain of taking positions start..start+length-1 out of the show and closing the gap."""
+        end = start + length - 1
+        return self.points(self.at(start - 1), self.at(end + 1)) - self.edge_at(start - 1) - self.edge_at(end)
+
+    def insertion_delta(self, start: int, length: int, after: int, reverse: bool = False) -> int:
+        """Gain of putting the segment at start..start+length-1 between positions after and after + 1.
+
+        Not counting its removal: the two add up to move_delta, and callers
+        trying many places for one segment compute the removal once.
+        """
+        order, points = self.order, self._points
+        first, last = order[start], order[start + length - 1]
+        if reverse:
+            first, last = last, first
+        # The hottest query of the optimizers: positions are checked inline rather than through at()
+        gain = 0
+        if after >= 0:
+            gain += points(order[after], first) - self.edge[after]
+        if after + 1 < len(order):
+            gain += points(last, order[after + 1])
+        return gain
+
+    def move_delta(self, start: int, length: int, after: int, reverse: bool = False) -> int:
+        """Gain of moving positions start..start+length-1 between positions after and after + 1.
+
+        An `after` in start-1..start+length-1 leaves the segment where it is:
+        the gain is 0, or that of reversing it in place.
+        """
+        if start - 1 <= after < start + length:
+            return self.reverse_delta(start, start + length - 1) if reverse else 0
+        return self.removal_delta(start, length) + self.insertion_delta(start, length, after, reverse)
+
+    def move(self, start: int, length: int, after: int, reverse: bool = False):
+        end = start + length - 1
+        if start - 1 <= after <= end:
+            if reverse:
+                self.reverse(start, end)
+            return
+        order, edge = self.order, self.edge
+        segment = order[start:end + 1]
+        inner = edge[start:end]
+        if reverse:
+            segment.reverse()
+            inner.reverse()
+        if after > end:
+            lo, hi = start, after
+            old = sum(edge[max(lo - 1, 0):hi + 1])
+            block = order[end + 1:after + 1]
+            block_inner = edge[end + 1:after]
+            order[lo:hi + 1] = block + segment
+            edge[lo:hi] = block_inner + [self.points(block[-1], segment[0])] + inner
+        else:
+            lo, hi = after + 1, end
+            old = sum(edge[max(lo - 1, 0):hi + 1])
+            block = order[after + 1:start]
+            block_inner = edge[after + 1:start - 1]
+            order[lo:hi + 1] = segment + block
+            edge[lo:hi] = inner + [self.points(segment[-1], block[0])] + block_inner
+        self._relink(lo, hi, old)
+
+    def relocate_delta(self, position: int, after: int) -> int:
+        """Gain of moving the slide at `position` between positions after and after + 1."""
+        if position - 1 <= after <= position:
+            return 0
+        return self.removal_delta(position, 1) + self.insertion_delta(position, 1, after)
+
+    def relocate(self, position: int, after: int):
+        self.move(position, 1, after)
+
+    def swap_delta(self, i: int, j: int) -> int:
+        """Gain of exchanging the slides at positions i and j."""
+        if i == j:
+            return 0
+        if i > j:
+            i, j = j, i
+        a, b = self.order[i], self.order[j]
+        before, after = self.at(i - 1), self.at(j + 1)
+        if j == i + 1:
+            old = self.edge_at(i - 1) + self.edge[i] + self.edge[j]
+            new = self.points(before, b) + self.points(b, a) + self.points(a, after)
+        else:
+            old = self.edge_at(i - 1) + self.edge[i] + self.edge[j - 1] + self.edge[j]
+            new = (self.points(before, b) + self.points(b, self.order[i + 1])
+                   + self.points(self.order[j - 1], a) + self.points(a, after))
+        return new - old
+
+    def swap(self, i: int, j: int):
+        if i == j:
+            return
+        if i > j:
+            i, j = j, i
+        order, edge = self.order, self.edge
+        order[i], order[j] = order[j], order[i]
+        self.pos[order[i]], self.pos[order[j]] = i, j
+        for position in {i - 1, i, j - 1, j}:
+            if position >= 0:
+                new = self.points(order[position], self.at(position + 1))
+                self.total += new - edge[position]
+                edge[position] = new
@@ -0,0 +1,139 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+from typing import List, NamedTuple, Optional, Tuple
+from KCW_Fantastic4_scoring_Team7 import ranges, row_offsets
+
+CACHE_FILES = ("offsets", "tag_ids", "landscape", "tags")
+SOURCE_FILE = "source.txt"  # Absolute path of the input a cache entry was built from
+
+
+class PhotoData(NamedTuple):
+    """Parsed input in flat arrays: photo i has tag ids tag_ids[offsets[i]:offsets[i+1]]."""
+    offsets: np.ndarray
+    tag_ids: np.ndarray
+    landscape: np.ndarray  # True for landscape (L/H) photos, False for portraits (P/V)
+    tags: np.ndarray  # Tag strings, indexed by tag id
+    private: Optional[np.ndarray] = None  # Per photo, tags folded away by compact_tags (not cached)
+
+    def __len__(self):
+        return len(self.landscape)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Tag count of every photo, folded tags included."""
+        sizes = np.diff(self.offsets)
+        return sizes if self.private is None else sizes + self.private
+
+    def gather(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Tag ids of the photos in `rows`, flattened, and the index into `rows` each one belongs to."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        return np.repeat(np.arange(len(rows)), lengths), np.asarray(self.tag_ids[ranges(starts, lengths)])
+
+    def photo_tags(self) -> List[List[int]]:
+        """Tag ids of every photo as Python lists, for the object-based solvers."""
+        assert self.private is None, "photo_tags needs uncompacted data"
+        tag_ids = self.tag_ids.tolist()
+        offsets = self.offsets.tolist()
+        return [tag_ids[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def load_photos(file_path: str) -> PhotoData:
+    """Parse an input file in one pass over its bytes, interning tags to dense ids."""
+    with open(file_path, "rb") as f:
+        lines = f.read().split(b"\n")
+    num_photos = int(lines[0])
+    tag_map = {}
+    intern = tag_map.setdefault
+    offsets = np.zeros(num_photos + 1, dtype=np.int64)
+    landscape = np.zeros(num_photos, dtype=bool)
+    tag_ids = []
+    for i in range(num_photos):
+        fields = lines[i + 1].split()
+        landscape[i] = fields[0] in (b"L", b"H")
+        tag_ids.extend([intern(tag, len(tag_map)) for tag in fields[2:]])
+        offsets[i + 1] = len(tag_ids)
+    tags = np.array([tag.decode() for tag in tag_map], dtype=str)
+    return PhotoData(offsets, np.array(tag_ids, dtype=np.int32), landscape, tags)
+
+
+def compact_tags(data: PhotoData) -> PhotoData:
+    """Fold the tags seen on a single photo into its private count, and renumber the others by descending frequency.
+
+    A tag no other photo has never adds to an intersection, only to its photo's
+    size, so the interest of every transition is unchanged as long as sizes
+    include the private count.
+    """
+    frequency = np.bincount(data.tag_ids, minlength=len(data.tags))
+    order = np.argsort(-frequency, kind="stable")
+    kept = order[frequency[order] > 1]
+    new_ids = np.full(len(data.tags), -1, dtype=np.int32)
+    new_ids[kept] = np.arange(len(kept), dtype=np.int32)
+    tag_ids = new_ids[data.tag_ids]
+    shared = tag_ids != -1
+    photo = np.repeat(np.arange(len(data)), np.diff(data.offsets))
+    private = np.bincount(photo[~shared], minlength=len(data))
+    if data.private is not None:
+        private += data.private
+    offsets = row_offsets(photo[shared], len(data))
+    return PhotoData(offsets, tag_ids[shared], np.asarray(data.landscape), np.asarray(data.tags)[kept], private)
+
+
+def file_digest(file_path: str) -> str:
+    """Content hash of the input, used as the cache key."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_cache(cache_dir: str, data: PhotoData, source: Optional[str] = None):
+    # Write into a scratch directory and rename it, so a partial cache is never picked up
+    scratch_dir = cache_dir + ".tmp"
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    os.makedirs(scratch_dir)
+    for name, array in zip(CACHE_FILES, data):
+        np.save(os.path.join(scratch_dir, name + ".npy"), array)
+    if source is not None:
+        with open(os.path.join(scratch_dir, SOURCE_FILE), "w") as f:
+            f.write(source)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(scratch_dir, cache_dir)
+
+
+def prune_cache(cache_root: str, keep: str, source: str):
+    """Remove the cache entries of `source` other than `keep`: they were keyed by an older content of the file."""
+    for entry in os.listdir(cache_root):
+        entry_dir = os.path.join(cache_root, entry)
+        if entry_dir == keep:
+            continue
+        try:
+            with open(os.path.join(entry_dir, SOURCE_FILE), "r") as f:
+                stale = f.read() == source
+        except OSError:
+            continue
+        if stale:
+            # Readers that still map the old arrays keep them alive until they close them
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+
+def load_cache(cache_dir: str) -> Optional[PhotoData]:
+    if not os.path.isdir(cache_dir):
+        return None
+    return PhotoData(*(np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode="r") for name in CACHE_FILES))
+
+
+def load_photos_cached(file_path: str, cache_root: str) -> PhotoData:
+    """load_photos backed by a memory-mapped cache keyed by the content of the input."""
+    cache_dir = os.path.join(cache_root, file_digest(file_path))
+    data = load_cache(cache_dir)
+    if data is None:
+        data = load_photos(file_path)
+        source = os.path.abspath(file_path)
+        save_cache(cache_dir, data, source)
+        prune_cache(cache_root, cache_dir, source)
+    return data
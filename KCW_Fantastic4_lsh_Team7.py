@@ -0,0 +1,84 @@
+import numpy as np
+from typing import Tuple
+from KCW_Fantastic4_metrics_Team7 import count
+from KCW_Fantastic4_scoring_Team7 import InterestScorer, ranges
+
+PRIME = (1 << 31) - 1
+
+
+class MinHashIndex:
+    """Banded MinHash LSH over the rows of an InterestScorer, for approximate next-slide search.
+
+    Every row gets `bands * rows` MinHash values of its tag set; each band of
+    `rows` values is hashed to one bucket key. Two rows sharing a fraction J
+    of their tags land in a common bucket with probability
+    1 - (1 - J^rows)^bands: more bands raise the recall, more rows per band
+    shrink the candidate lists. best() only scores the rows found in the
+    buckets of the query, and returns (-1, -1) when none of them is worth
+    taking, for the caller to fall back to an exact search.
+    """
+
+    def __init__(self, scorer: InterestScorer, bands: int = 32, rows: int = 3, seed: int = 0):
+        self.scorer = scorer
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        a = rng.integers(1, PRIME, size=bands * rows, dtype=np.int64)
+        b = rng.integers(0, PRIME, size=bands * rows, dtype=np.int64)
+        # The hash values of every tag under every function; a signature is the column-wise min over its tags
+        vocabulary = np.arange(scorer.matrix.shape[1], dtype=np.int64)[:, None]
+        self.table = ((a * vocabulary + b) % PRIME).astype(np.int32)
+        matrix = scorer.matrix
+        keys = self._band_keys(self._signatures(matrix.indptr, matrix.indices))
+        # Every (key, row) pair in one sorted array: the rows of a bucket are a contiguous range
+        order = np.argsort(keys.ravel(), kind="stable")
+        self.keys = keys.ravel()[order]
+        self.members = (order // bands).astype(np.int64)
+
+    def _signatures(self, indptr: np.ndarray, tag_ids: np.ndarray, chunk: int = 1 << 20) -> np.ndarray:
+        num_rows = len(indptr) - 1
+        signatures = np.full((num_rows, self.table.shape[1]), PRIME, dtype=np.int32)
+        filled = np.flatnonzero(np.diff(indptr))
+        # Rows are hashed in blocks of about `chunk` tags, to bound the (tags x functions) temporary
+        start = 0
+        while start < len(filled):
+            end = int(np.searchsorted(indptr[filled + 1], indptr[filled[start]] + chunk, side="right"))
+            end = max(end, start + 1)
+            rows = filled[start:end]
+            lo, hi = indptr[rows[0]], indptr[rows[-1] + 1]
+            hashed = self.table[tag_ids[lo:hi]]
+            signatures[rows] = np.minimum.reduceat(hashed, indptr[rows] - lo, axis=0)
+            start = end
+        return signatures
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        keys = np.arange(self.bands, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        with np.errstate(over="ignore"):
+            for j in range(self.rows):
+                keys = (keys ^ bands[:, :, j]) * np.uint64(0x100000001B3)
+        return keys
+
+    def candidates(self, tags) -> np.ndarray:
+        """Rows sharing at least one bucket with a slide with `tags`."""
+        tag_ids = self.scorer._tag_ids(tags)
+        if len(tag_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        keys = self._band_keys(self.table[tag_ids].min(axis=0)[None, :])[0]
+        first = np.searchsorted(self.keys, keys, side="left")
+        last = np.searchsorted(self.keys, keys, side="right")
+        index = ranges(first, last - first)
+        count("index_hits", len(index))
+        return np.unique(self.members[index])
+
+    def best(self, tags, alive: np.ndarray) -> Tuple[int, int]:
+        """(row, interest) of the best alive candidate, ties going to the lowest row; (-1, -1) if none scores."""
+        rows = self.candidates(tags)
+        rows = rows[alive[rows].astype(bool)]
+        if len(rows) == 0:
+            return -1, -1
+        scores = self.scorer.scores(tags, rows)
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return -1, -1
+        return int(rows[best]), int(scores[best])
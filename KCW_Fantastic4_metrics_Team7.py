@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import time
+import atexit
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict
+
+# Phases the solvers report: parse, hash, pair, greedy, improve and write
+timings: Dict[str, float] = {}
+# Hot-path events: interest_calls (batches of candidates scored against one slide),
+# candidates_scanned (slide pairs scored) and index_hits (candidates an index returned)
+counters = Counter()
+
+
+@contextmanager
+def phase(name: str):
+    """Add the wall time of the block to the named phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def count(name: str, n: int = 1):
+    """Hot loops should add their events in one call per iteration, not one per event."""
+    counters[name] += n
+
+
+def reset():
+    timings.clear()
+    counters.clear()
+
+
+def report() -> dict:
+    return {"phases": dict(timings), "counters": dict(counters)}
+
+
+def write_report(file_path: str):
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as f:
+        json.dump(report(), f, indent=2)
+
+
+def report_at_exit(file_path: str):
+    """Write the JSON report when the script exits."""
+    atexit.register(write_report, file_path)
+
+
+class Progress:
+    """Progress line on stderr, redrawn at most once per `interval` seconds."""
+
+    def __init__(self, label: str, total: int, interval: float = 0.5):
+        self.label = label
+        self.total = max(total, 1)
+        self.interval = interval
+        self._next = time.monotonic() + interval
+
+    def update(self, done: int):
+        now = time.monotonic()
+        if now < self._next:
+            return
+        self._next = now + self.interval
+        sys.stderr.write(f"\r{self.label}: {100 * done / self.total:.1f}%")
+        sys.stderr.flush()
+
+    def close(self):
+        sys.stderr.write(f"\r{self.label}: done\n")
+        sys.stderr.flush()
@@ -1,143 +1,113 @@
 import os
-import json
 import time
-from tqdm import tqdm
-from bitarray import bitarray
-from typing import List, Tuple, Dict
+import random
+from typing import List, Optional, Tuple
+import KCW_Fantastic4_metrics_Team7 as metrics
+from KCW_Fantastic4_loader_Team7 import PhotoData, load_photos_cached
+from KCW_Fantastic4_pairing_Team7 import pair_portraits
+from KCW_Fantastic4_scoring_Team7 import BitsetStore, InterestScorer, NextSlideSearch
+from KCW_Fantastic4_store_Team7 import PhotoView, SlideStore, SlideView, photo_views
 
 INF = 99999999
 
 
-class Photo:
-    def __init__(self, index: int, photo_type: str, tags: List[str]):
-        self.index = index
-        self.type = photo_type
-        self.tags = tags
-        self.hash_tags = bitarray(500)  # Simulate bitset with size 500
-        self.hash_tags.setall(False)
-
-    def to_dict(self) -> dict:
-        return {
-            "index": self.index,
-            "type": self.type,
-            "tags": self.tags,
-            "hash_tags": self.hash_tags.to01()  # Convert bitarray to string for JSON serialization
-        }
-
-    @staticmethod
-    def from_dict(data: dict) -> 'Photo':
-        photo = Photo(index=data["index"], photo_type=data["type"], tags=data["tags"])
-        photo.hash_tags = bitarray(data["hash_tags"])  # Convert string back to bitarray
-        return photo
-
-
-class SlideShow:
-    def __init__(self, photo1: Photo, photo2: Photo = None):
-        self.index1 = photo1.index
-        self.index2 = photo2.index if photo2 else -1
-        self.tags = photo1.hash_tags.copy()
-        if photo2:
-            self.tags |= photo2.hash_tags
-
-
 class Album:
-    def __init__(self):
+    def __init__(self, slide_bits: BitsetStore):
+        self.slide_bits = slide_bits
         self.slides = []
         self.score = 0
 
-    def add_slide(self, slide: SlideShow):
+    def add_slide(self, slide: SlideView):
         if self.slides:
-            prev_tags = self.slides[-1].tags
-            self.score += calculate_interest(prev_tags, slide.tags)
+            prev_row = self.slides[-1].index
+            self.score += calculate_interest(self.slide_bits, prev_row, slide.index)
         self.slides.append(slide)
 
 
-def calculate_interest(tags1: bitarray, tags2: bitarray) -> int:
-    intersection_count = (tags1 & tags2).count()
-    count1 = tags1.count()
-    count2 = tags2.count()
+def calculate_interest(bits: BitsetStore, row1: int, row2: int) -> int:
+    intersection_count = bits.intersection(row1, row2)
+    count1 = int(bits.counts[row1])
+    count2 = int(bits.counts[row2])
     return min(intersection_count, count1 - intersection_count, count2 - intersection_count)
 
 
-def read_input(file_path: str) -> Tuple[List[Photo], Dict[str, int]]:
-    with open(file_path, "r") as f:
-        num_photos = int(f.readline().strip())
-        photos = []
-        tag_map = {}
-        for i in tqdm(range(num_photos), desc="Reading Photos", unit="photo"):
-            line = f.readline().strip().split()
-            photo_type = line[0]
-            tags = line[2:]
-            photos.append(Photo(index=i, photo_type=photo_type, tags=tags))
-            for tag in tags:
-                if tag not in tag_map:
-                    tag_map[tag] = len(tag_map)
-        return photos, tag_map
-
-
-def save_to_json(file_path: str, photos: List[Photo], tag_map: Dict[str, int]):
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    data = {
-        "photos": [photo.to_dict() for photo in photos],
-        "tag_map": tag_map,
-    }
-    with open(file_path, "w") as f:
-        json.dump(data, f)
+def create_photos(data: PhotoData) -> List[PhotoView]:
+    return photo_views(data)
 
 
-def load_from_json(file_path: str) -> Tuple[List[Photo], Dict[str, int]]:
-    with open(file_path, "r") as f:
-        data = json.load(f)
-        photos = [Photo.from_dict(photo_data) for photo_data in data["photos"]]
-        tag_map = data["tag_map"]
-    return photos, tag_map
+def hash_photos(data: PhotoData) -> BitsetStore:
+    return BitsetStore.from_csr(data.offsets, data.tag_ids, len(data.tags), data.private)
 
 
-def hash_photos(photos: List[Photo], tag_map: Dict[str, int]):
-    for photo in tqdm(photos, desc="Tags Hashing Photos", unit="photo"):
-        for tag in photo.tags:
-            photo.hash_tags[tag_map[tag]] = True
+def hash_slides(store: SlideStore, photo_bits: BitsetStore) -> BitsetStore:
+    return BitsetStore.from_csr(store.offsets, store.tag_ids, photo_bits.words * 64, store.private)
 
 
-def solve(photos: List[Photo]) -> Album:
-    horizontal_photos = [p for p in photos if p.type == "L"]
-    vertical_photos = [p for p in photos if p.type == "P"]
+def solve(photos: List[PhotoView], photo_bits: BitsetStore,
+          pairing: Optional[str] = None, seed: Optional[int] = None,
+          lsh: Optional[Tuple[int, int]] = None) -> Album:
+    if not photos:
+        return Album(photo_bits)
+    horizontal_photos = [p.index for p in photos if p.landscape]
+    vertical_photos = [p.index for p in photos if not p.landscape]
 
-    # Pair vertical photos based on tag similarity
-    vertical_photos.sort(key=lambda p: p.hash_tags.count())
-    paired_verticals = []
-    while len(vertical_photos) > 1:
-        paired_verticals.append(SlideShow(vertical_photos.pop(), vertical_photos.pop()))
+    # Pair vertical photos with one of the pairing modes, or by tag count when pairing is None
+    with metrics.phase("pair"):
+        first, second = list(horizontal_photos), [-1] * len(horizontal_photos)
+        if pairing is not None:
+            pair_first, pair_second = pair_portraits(photos[0].data, vertical_photos, pairing)
+            first.extend(pair_first.tolist())
+            second.extend(pair_second.tolist())
+        else:
+            vertical_photos.sort(key=lambda i: photo_bits.counts[i])
+            while len(vertical_photos) > 1:
+                first.append(vertical_photos.pop())
+                second.append(vertical_photos.pop())
+        if seed is not None:
+            slide_photos = list(zip(first, second))
+            random.Random(seed).shuffle(slide_photos)
+            first, second = [a for a, _ in slide_photos], [b for _, b in slide_photos]
 
-    slides = [SlideShow(photo) for photo in horizontal_photos] + paired_verticals
+        store = SlideStore(photos[0].data, first, second)
+        slides = store.views()
+        slide_bits = hash_slides(store, photo_bits)
 
+    with metrics.phase("greedy"):
+        return build_album(slides, slide_bits, lsh)
+
+
+def build_album(slides: List[SlideView], slide_bits: BitsetStore,
+                lsh: Optional[Tuple[int, int]] = None) -> Album:
     # Optimize slide arrangement
-    album = Album()
-    used = set()
+    album = Album(slide_bits)
+    if not slides:
+        return album
+    assert slides[0].store.private is None, "the greedy search needs uncompacted data"
+    scorer = InterestScorer(slide.tags.tolist() for slide in slides)
+    search = NextSlideSearch(scorer, lsh)
+
     current_slide = slides[0]
     album.add_slide(current_slide)
-    used.add(current_slide.index1)
-    if current_slide.index2 != -1:
-        used.add(current_slide.index2)
-
-    for _ in tqdm(range(1, len(slides)), desc="Creating Album", unit="slide"):
-        best_slide = None
-        best_interest = -INF
-
-        for slide in slides:
-            if slide.index1 not in used and (slide.index2 == -1 or slide.index2 not in used):
-                current_interest = calculate_interest(current_slide.tags, slide.tags)
-                if current_interest > best_interest:
-                    best_interest = current_interest
-                    best_slide = slide
-
-        if best_slide:
-            album.add_slide(best_slide)
-            used.add(best_slide.index1)
-            if best_slide.index2 != -1:
-                used.add(best_slide.index2)
-            current_slide = best_slide
-
+    search.remove(0)
+    next_unplaced = 0
+
+    progress = metrics.Progress("Creating Album", len(slides))
+    for step in range(1, len(slides)):
+        progress.update(step)
+        best_position, best_interest = search.best(current_slide.tags)
+
+        if best_interest <= 0:
+            # Slides sharing no tag score 0 too, so take the first unplaced one like a full scan would
+            while not search.unplaced[next_unplaced]:
+                next_unplaced += 1
+            best_position = next_unplaced
+
+        best_slide = slides[best_position]
+        album.add_slide(best_slide)
+        search.remove(best_position)
+        current_slide = best_slide
+
+    progress.close()
     return album
 
 
@@ -146,35 +116,32 @@ def write_output(file_path: str, album: Album):
     with open(file_path, "w") as f:
         f.write(f"{len(album.slides)}\n")
         for slide in album.slides:
-            if slide.index2 != -1:
-                f.write(f"{slide.index1} {slide.index2}\n")
+            if slide.second != -1:
+                f.write(f"{slide.first} {slide.second}\n")
             else:
-                f.write(f"{slide.index1}\n")
+                f.write(f"{slide.first}\n")
 
 
 def main():
-    start_time = time.time()
     input_file = "./inputs/110_oily_portraits.txt"
-    json_file = "./pycache/op/photos_data.json"
+    cache_root = "./pycache/op"
     output_file = "./outputs/output_110_oily_portraits.txt"
+    start_time = time.time()
+
+    metrics.report_at_exit("./outputs/metrics_110_oily_portraits.json")
 
-    print("Reading input...")
-    if os.path.exists(json_file):
-        print("Loading data from JSON cache...")
-        photos, tag_map = load_from_json(json_file)
-    else:
-        photos, tag_map = read_input(input_file)
-        save_to_json(json_file, photos, tag_map)
+    with metrics.phase("parse"):
+        data = load_photos_cached(input_file, cache_root)
+        photos = create_photos(data)
 
-    print("Hashing Tags in photos...")
-    hash_photos(photos, tag_map)
+    with metrics.phase("hash"):
+        photo_bits = hash_photos(data)
 
-    print("Solving the problem...")
-    album = solve(photos)
+    album = solve(photos, photo_bits)
 
-    print("Writing output...")
-    os.makedirs("./outputs", exist_ok=True)
-    write_output(output_file, album)
+    with metrics.phase("write"):
+        os.makedirs("./outputs", exist_ok=True)
+        write_output(output_file, album)
 
     elapsed_time = time.time() - start_time
     print(f"Execution Time: {elapsed_time:.2f} seconds")
@@ -0,0 +1,133 @@
+import numpy as np
+from typing import Hashable, Iterable, Optional, Tuple
+from KCW_Fantastic4_loader_Team7 import PhotoData
+from KCW_Fantastic4_metrics_Team7 import count
+from KCW_Fantastic4_scoring_Team7 import ranges, row_offsets
+
+PAIRING_MODES = ("disjoint", "max_union")
+
+
+class PortraitPairer:
+    """Pairs portrait photos into slides, using tag-count buckets and an inverted tag index.
+
+    Photos are sorted by tag count, so each bucket is a contiguous range of
+    positions. The inverted index lists, for every tag, the positions of the
+    photos that carry it in ascending order: counting how many tags a photo
+    shares with every photo of a bucket only touches the postings of its own
+    tags that fall in the range, found by binary search.
+
+    Photo i has the tags tag_ids[offsets[i]:offsets[i+1]]; `sizes` defaults to
+    their count, and may be larger when some tags were folded away.
+    """
+
+    def __init__(self, offsets: np.ndarray, tag_ids: np.ndarray, sizes: Optional[np.ndarray] = None):
+        offsets = np.asarray(offsets, dtype=np.int64)
+        tag_ids = np.asarray(tag_ids, dtype=np.int64)
+        lengths = np.diff(offsets)
+        sizes = lengths if sizes is None else np.asarray(sizes, dtype=np.int64)
+        n = len(lengths)
+        self.order = np.argsort(sizes, kind="stable")  # Position -> photo
+        self.sizes = sizes[self.order]
+        position = np.empty(n, dtype=np.int64)
+        position[self.order] = np.arange(n)
+        # Postings sorted by (tag, position): the key tag * n + position locates a tag's range in one search
+        keys = np.sort(tag_ids * max(n, 1) + np.repeat(position, lengths))
+        self.keys = keys
+        self.postings = keys % max(n, 1)
+        self.tag_ids = [tag_ids[offsets[photo]:offsets[photo + 1]] for photo in self.order.tolist()]
+        self.starts = np.flatnonzero(np.r_[True, np.diff(self.sizes) != 0]) if n else np.zeros(0, dtype=np.int64)
+        self.ends = np.r_[self.starts[1:], n].astype(np.int64)
+        self.remaining = self.ends - self.starts
+        self.bucket = np.repeat(np.arange(len(self.starts)), self.remaining)
+        self.alive = np.ones(n, dtype=bool)
+
+    @classmethod
+    def from_tag_lists(cls, tag_lists: Iterable[Iterable[Hashable]]) -> 'PortraitPairer':
+        vocabulary = {}
+        offsets = [0]
+        tag_ids = []
+        for tags in tag_lists:
+            tag_ids.extend(vocabulary.setdefault(tag, len(vocabulary)) for tag in tags)
+            offsets.append(len(tag_ids))
+        return cls(np.asarray(offsets), np.asarray(tag_ids))
+
+    @classmethod
+    def from_data(cls, data: PhotoData, rows: np.ndarray) -> 'PortraitPairer':
+        rows = np.asarray(rows, dtype=np.int64)
+        photo, tag_ids = data.gather(rows)
+        return cls(row_offsets(photo, len(rows)), tag_ids, data.sizes[rows])
+
+    def __len__(self):
+        return len(self.order)
+
+    def _shared(self, tag_ids: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        """Tags shared with `tag_ids` by each photo at positions lo..hi-1."""
+        n = len(self.order)
+        first = np.searchsorted(self.keys, tag_ids * n + lo)
+        last = np.searchsorted(self.keys, tag_ids * n + hi)
+        count("candidates_scanned", hi - lo)
+        return np.bincount(self.postings[ranges(first, last - first)] - lo, minlength=hi - lo)
+
+    def _take(self, position: int):
+        self.alive[position] = False
+        self.remaining[self.bucket[position]] -= 1
+
+    def _disjoint_partner(self, position: int) -> int:
+        """Photo with the fewest tags sharing none with the given one; else the one sharing the fewest."""
+        tag_ids = self.tag_ids[position]
+        partner, fewest = -1, np.iinfo(np.int64).max
+        for bucket in np.flatnonzero(self.remaining).tolist():
+            lo, hi = int(self.starts[bucket]), int(self.ends[bucket])
+            shared = np.where(self.alive[lo:hi], self._shared(tag_ids, lo, hi), fewest)
+            best = int(np.argmin(shared))
+            if shared[best] < fewest:
+                partner, fewest = lo + best, int(shared[best])
+                if fewest == 0:
+                    break
+        return partner
+
+    def _union_partner(self, position: int) -> int:
+        """Photo giving the largest union of tags, searched from the largest bucket down."""
+        tag_ids = self.tag_ids[position]
+        size = int(self.sizes[position])
+        partner, largest = -1, -1
+        for bucket in np.flatnonzero(self.remaining)[::-1].tolist():
+            lo, hi = int(self.starts[bucket]), int(self.ends[bucket])
+            if size + int(self.sizes[lo]) <= largest:
+                break  # The smaller buckets cannot do better
+            union = np.where(self.alive[lo:hi], size + self.sizes[lo:hi] - self._shared(tag_ids, lo, hi), -1)
+            best = int(np.argmax(union))
+            if union[best] > largest:
+                partner, largest = lo + best, int(union[best])
+        return partner
+
+    def pairs(self, mode: str = "disjoint") -> Tuple[np.ndarray, np.ndarray]:
+        """Pair the photos, the one with the fewest tags first; returns the indices of both sides.
+
+        mode "disjoint" gives each photo the smallest partner it shares no tag
+        with, "max_union" the partner with the largest union of tags. With an
+        odd number of photos the largest one is left out.
+        """
+        if mode not in PAIRING_MODES:
+            raise ValueError(f"unknown pairing mode {mode!r}, expected one of {PAIRING_MODES}")
+        find_partner = self._disjoint_partner if mode == "disjoint" else self._union_partner
+        first, second = [], []
+        for position in range(len(self.order) - 1):
+            if not self.alive[position]:
+                continue
+            self._take(position)
+            partner = find_partner(position)
+            if partner == -1:
+                self.alive[position] = True
+                break
+            self._take(partner)
+            first.append(position)
+            second.append(partner)
+        return self.order[np.asarray(first, dtype=np.int64)], self.order[np.asarray(second, dtype=np.int64)]
+
+
+def pair_portraits(data: PhotoData, rows: np.ndarray, mode: str = "disjoint") -> Tuple[np.ndarray, np.ndarray]:
+    """Pair the portrait photos `rows` of `data`; returns the photo ids of both sides of each slide."""
+    rows = np.asarray(rows, dtype=np.int64)
+    first, second = PortraitPairer.from_data(data, rows).pairs(mode)
+    return rows[first], rows[second]
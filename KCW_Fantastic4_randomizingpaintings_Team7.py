@@ -1,6 +1,16 @@
+import os
+import sys
 import time  # Import the time module
+import queue
+import random
+import threading
+import KCW_Fantastic4_metrics_Team7 as metrics
+from KCW_Fantastic4_loader_Team7 import load_photos
+from KCW_Fantastic4_pairing_Team7 import PortraitPairer
 
 class Photo:
+    __slots__ = ("id", "landscape", "tags", "is_framed")
+
     def __init__(self, photo_id, landscape, tags):
         self.id = photo_id
         self.landscape = landscape
@@ -23,25 +33,20 @@ class LoadPhotos:
         self.photos = {}
 
     def read_file(self):
-        file_in = open(self.filename, "r")
-        file_in.readline()
-        lines = file_in.readlines()
+        return self.load(load_photos(self.filename))
 
+    def load(self, data):
         self.photos = {}
-        i = 0
-        for line in lines:
-            line = line.split()
-            if len(line) <= 2:  # Skip images with no tags
+        for i, (landscape, tags) in enumerate(zip(data.landscape.tolist(), data.photo_tags())):
+            if not tags:  # Skip images with no tags, keeping the ids of the others
                 continue
-            image_type = line[0]
-            line = line[2:]
-            self.photos[i] = Photo(i, image_type, line)
-            i += 1
-        file_in.close()
+            self.photos[i] = Photo(i, "L" if landscape else "P", tags)
         return self
 
 
 class Slide:
+    __slots__ = ("photo", "photoA", "photoB", "id", "tags", "is_valid")
+
     def __init__(self, photo_a, photo_b=None):
         self.photo = photo_a
         self.photoA = photo_a
@@ -100,58 +105,21 @@ def find_common(p1, p2):
     return len(p1.tags.intersection(p2.tags))
 
 
-def get_matching_vertical_photo(index, photo, photos, accuracy=0):
-    if accuracy == 0:
-        accuracy = len(photos)
-
-    v_photo = None
-    tot_photos = len(photos)
-    for i in range(tot_photos):
-        i = i + index + 1
-        if tot_photos <= i:
-            continue
-        p1 = photos[i]
-        if p1.is_horizontal() or p1.id == photo.id or p1.is_framed:
-            continue
-
-        if i >= accuracy:
-            swap_list(photos, index + 1, i)
-            return p1
-
-        v_photo = p1
-        common = find_common(photo, p1)
-        if common == 0:
-            swap_list(photos, index + 1, i)
-            return p1
-    return v_photo
-
-
 def get_vertical_slides(v_photo_list, v_algo=0):
+    """Pair the portraits: v_algo 0 gives each the smallest partner sharing no tag with it,
+    1 pairs the smallest with the largest, 2 picks the partner with the largest union of tags."""
     slide_list = []
     i = -1
-    p_ids = []
     v_photo_list.sort(key=lambda x: len(x.tags))
     print("Calculating score of 11_randomizing_paintings.txt")
-    if v_algo == 0:
-        while len(v_photo_list) - 1 > i:
-            i += 1
-            p1 = v_photo_list[i]
-            if p1.is_framed:
-                continue
-            p2 = get_matching_vertical_photo(i, p1, v_photo_list, 0)
-            if p2 is not None:
-                slide_list.append(Slide(p1, p2))
-                p1.is_framed = True
-                p2.is_framed = True
-                if p1.id in p_ids:
-                    print("duplicate", p1.id)
-                else:
-                    p_ids.append(p1.id)
-                if p2.id in p_ids:
-                    print("duplicate", p2.id)
-                else:
-                    p_ids.append(p2.id)
-                swap_list(v_photo_list, i + 1, v_photo_list.index(p2))
+    if v_algo != 1:
+        pairer = PortraitPairer.from_tag_lists(p.tags for p in v_photo_list)
+        first, second = pairer.pairs("max_union" if v_algo == 2 else "disjoint")
+        for a, b in zip(first.tolist(), second.tolist()):
+            p1, p2 = v_photo_list[a], v_photo_list[b]
+            slide_list.append(Slide(p1, p2))
+            p1.is_framed = True
+            p2.is_framed = True
     else:
         p_len = len(v_photo_list)
         while (p_len / 2) > 1 + i:
@@ -176,43 +144,168 @@ def calculate_score(s1, s2):
     return min(common, (len(s1.tags) - common), (len(s2.tags) - common))
 
 
-def slide_algo(slides, accuracy=20000):
+class CheckpointLog:
+    """Append-only log of the slides fixed so far, one slide id per line.
+
+    Slides are handed over in batches and written by a background thread, so
+    the algorithm never waits on the disk and never rewrites what is logged.
+    """
+
+    def __init__(self, file_name, resume=False):
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+        self.file = open(file_name, "a" if resume else "w")
+        if resume:
+            self._drop_partial_line(file_name)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def _drop_partial_line(self, file_name):
+        # Appending after a line cut short would glue the next id to it
+        with open(file_name, "rb") as file_in:
+            end = file_in.read().rfind(b"\n") + 1
+        self.file.truncate(end)
+
+    def _write(self):
+        while True:
+            slides = self.queue.get()
+            if slides is None:
+                break
+            self.file.write("".join(slide.get_id() + "\n" for slide in slides))
+            self.file.flush()
+
+    def append(self, slides):
+        self.queue.put(slides)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+
+def read_checkpoint(file_name):
+    if not os.path.exists(file_name):
+        return []
+    with open(file_name, "r") as file_in:
+        # A last line without its newline was cut short by a crash, so its id may be truncated
+        return [line.strip() for line in file_in if line.endswith("\n") and line.strip()]
+
+
+def resume_slides(slides, slide_ids):
+    """Replay the swaps that brought the logged slides to the front, restoring the exact state."""
+    position = {slide.get_id(): k for k, slide in enumerate(slides)}
+    for k, slide_id in enumerate(slide_ids):
+        index = position[slide_id]
+        if index != k:
+            position[slides[k].get_id()] = index
+            position[slide_id] = k
+            swap_list(slides, k, index)
+    return len(slide_ids)
+
+
+class DeadlineWindow:
+    """Lookahead window resized so that the remaining slides finish by a deadline.
+
+    Every `interval` slides it measures how many candidates were scanned per
+    second and gives each remaining slide an equal share of the time left. When
+    small windows are dominated by the per-slide overhead the measured rate
+    drops too, so the window settles where the time per slide fits the budget.
+    """
+
+    def __init__(self, seconds, total, window, interval=256):
+        self.end = time.monotonic() + seconds
+        self.total = total
+        self.window = max(1, min(window, total))
+        self.interval = interval
+        self._block_start = time.monotonic()
+        self._block_scanned = 0
+
+    def update(self, i, scanned):
+        if i % self.interval:
+            return self.window
+        now = time.monotonic()
+        elapsed = now - self._block_start
+        if elapsed > 0 and scanned > self._block_scanned:
+            rate = (scanned - self._block_scanned) / elapsed
+            time_left = self.end - now
+            remaining = max(self.total - i, 1)
+            self.window = max(1, min(int(rate * time_left / remaining), self.total))
+        self._block_start = now
+        self._block_scanned = scanned
+        return self.window
+
+
+def slide_algo(slides, accuracy=20000, checkpoint_file="output/output_11_randomizing_portraits.log",
+               resume=False, deadline=None):
+    """Greedy ordering over a lookahead window of `accuracy` slides.
+
+    With a `deadline` in seconds the window starts at `accuracy` and is then
+    resized as the run goes to finish the ordering in about that time.
+    """
     print("Starting algorithm")
     i, final_score, temp = 0, 0, 0
-    while len(slides) > i:
-        s1 = slides[i]
-        index = i + 1
-        j = 1
-        max_score = -1
-        while len(slides) > i + j:
-            s2 = slides[i + j]
-            if j > accuracy:
-                break
-            score = calculate_score(s1, s2)
-            if score > max_score:
-                index = i + j
-                max_score = score
-            j += 1
-
-        final_score += max_score if max_score > 0 else 0
-        if ((i + 1) % 1000) == 0:
-            print("i:", i, "finalScore", final_score, "accuracy", accuracy)
-        slides = swap_list(slides, i + 1, index)
-        i += 1
-        temp += 1
-        if (temp + 1) % 1000 == 0:
-            write_file(slides, temp)
+    scanned = 0
+    log = None
+    if checkpoint_file:
+        restored = resume_slides(slides, read_checkpoint(checkpoint_file)) if resume else 0
+        if restored:
+            i = temp = restored - 1
+            final_score = sum(calculate_score(slides[k], slides[k + 1]) for k in range(i))
+            print("Resumed", restored, "slides, finalScore", final_score)
+        log = CheckpointLog(checkpoint_file, resume=resume)
+        logged = restored
+    try:
+        window = DeadlineWindow(deadline, len(slides), accuracy) if deadline else None
+        progress = metrics.Progress("Slides", len(slides))
+        while len(slides) > i:
+            progress.update(i)
+            if window is not None:
+                accuracy = window.update(i, scanned)
+            s1 = slides[i]
+            index = i + 1
+            j = 1
+            max_score = -1
+            # No transition from s1 can score more than half its tags, so the scan stops once one does
+            bound = len(s1.tags) // 2
+            while len(slides) > i + j:
+                s2 = slides[i + j]
+                if j > accuracy:
+                    break
+                score = calculate_score(s1, s2)
+                if score > max_score:
+                    index = i + j
+                    max_score = score
+                    if max_score >= bound:
+                        j += 1
+                        break
+                j += 1
+            metrics.count("interest_calls")
+            metrics.count("candidates_scanned", j - 1)
+            scanned += j - 1
+
+            final_score += max_score if max_score > 0 else 0
+            slides = swap_list(slides, i + 1, index)
+            i += 1
+            temp += 1
+            if (temp + 1) % 1000 == 0 and log is not None:
+                # Positions up to i are fixed; only the ones not logged yet are sent
+                log.append(slides[logged:i + 1])
+                logged = i + 1
+        progress.close()
+        if log is not None:
+            log.append(slides[logged:])
+    finally:
+        # Whatever was appended so far reaches the file, even if the ordering fails
+        if log is not None:
+            log.close()
     print("final score ", final_score)
     return slides, final_score
 
 
 def write_file(slides, n=0, prepend_str="", file_name="output/output_11_randomizing_portraits.txt"):
-    result = prepend_str
     if n == 0:
         n = len(slides)
-    for slide in range(n):
-        result += slides[slide].get_id() + "\n"
-    result = str(n) + "\n" + result
+    result = str(n) + "\n" + prepend_str + "".join(slides[slide].get_id() + "\n" for slide in range(n))
     file_out = open(file_name, "w")
     try:
         file_out.write(result)
@@ -222,32 +315,51 @@ def write_file(slides, n=0, prepend_str="", file_name="output/output_11_randomiz
         file_out.close()
 
 
-def runner(data_list: list):
+def build_slides(photos, v_algo=0, seed=None):
+    vertical_slides = get_vertical_slides(get_vertical_photos(photos), v_algo)
+    horizontal_slides = get_horizontal_slides(get_horizontal_photos(photos))
+    slides = horizontal_slides + vertical_slides
+
+    print(len(photos), "=> P slides:", len(vertical_slides), "L slides:", len(horizontal_slides), "Len:", len(slides))
+    rng = random.Random(seed) if seed is not None else None
+    if rng is not None:
+        rng.shuffle(slides)  # Ties in the sort come in a random order
+    slides.sort(key=lambda x: len(x.tags))
+    if rng is not None and slides:
+        swap_list(slides, 0, rng.randrange(len(slides)))  # Random first slide
+    return slides
+
+
+def runner(data_list: list, resume=False):
     final_score = 0
     for data in data_list:
         filename = data[0]
-        photos = LoadPhotos("input/" + filename).read_file().photos
-        vertical_slides = get_vertical_slides(get_vertical_photos(photos))
-        horizontal_slides = get_horizontal_slides(get_horizontal_photos(photos))
-        slides = horizontal_slides + vertical_slides
-
-        print(len(photos), "=> P slides:", len(vertical_slides), "L slides:", len(horizontal_slides), "Len:", len(slides))
-        slides.sort(key=lambda x: len(x.tags))
-        slides, f_s = slide_algo(slides, accuracy=data[1])
+        with metrics.phase("parse"):
+            photos = LoadPhotos("input/" + filename).read_file().photos
+        with metrics.phase("pair"):
+            slides = build_slides(photos)
+        with metrics.phase("greedy"):
+            slides, f_s = slide_algo(slides, accuracy=data[1],
+                                     checkpoint_file="output/" + filename + ".log", resume=resume,
+                                     deadline=data[2] or None)
         final_score += f_s
-        write_file(slides, file_name="output/" + filename)
+        with metrics.phase("write"):
+            write_file(slides, file_name="output/" + filename)
         print("\n-----------\nFinal score for file:", f_s, "\n")
     return final_score
 
 
 if __name__ == "__main__":
     start_time = time.time()  # Start time tracking
+    metrics.report_at_exit("output/metrics_11_randomizing_paintings.json")
 
+    # File, lookahead window, and seconds for the greedy pass (0 keeps the window fixed)
     files = [
         ["11_randomizing_paintings.txt", 2500, 0]
     ]
     
-    total_score = runner(files)  # Run the logic
+    # --resume continues from the checkpoint logs of an interrupted run
+    total_score = runner(files, resume="--resume" in sys.argv[1:])  # Run the logic
     
     end_time = time.time()  # End time tracking
     print(f"\nTotal Execution Time: {end_time - start_time:.2f} seconds")
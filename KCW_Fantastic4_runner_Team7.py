@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import random
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+from KCW_Fantastic4_components_Team7 import split_components, subset
+from KCW_Fantastic4_loader_Team7 import PhotoData, load_photos_cached
+from KCW_Fantastic4_score_Team7 import score
+
+CACHE_ROOT = "./pycache/runner"
+MIN_COMPONENT = 1000  # Smaller tag components are batched together up to this many photos
+
+# A solved dataset: slides as (photo, second photo or -1), and the score the solver reported
+Result = Tuple[List[Tuple[int, int]], int]
+
+
+def solve_example(data: PhotoData, params: dict) -> Result:
+    import KCW_Fantastic4_example_Team7 as example
+    example.photoData = data
+    alb = example.solve()
+    return alb.index, alb.score
+
+
+def solve_binary_landscapes(data: PhotoData, params: dict) -> Result:
+    import KCW_Fantastic4_binarylandscapesfinal_Team7 as binary
+    binary.photoData = data
+    binary.solve()
+    return binary.alb['index'], binary.alb['score']
+
+
+def solve_computable_moments(data: PhotoData, params: dict) -> Result:
+    import KCW_Fantastic4_computablemomentsfinal_Team7 as computable
+    slideshow = computable.generateSlideshow(computable.photosFromData(data), seed=params.get("seed"),
+                                             lsh=params.get("lsh"))
+    if params.get("improve"):
+        slideshow = computable.improveSolution(slideshow)
+    slides = [(s.photo1_n, -1 if s.photo2_n is None else s.photo2_n) for s in slideshow]
+    return slides, computable.calculateScore(slideshow)
+
+
+def solve_randomizing_paintings(data: PhotoData, params: dict) -> Result:
+    import KCW_Fantastic4_randomizingpaintings_Team7 as randomizing
+    photos = randomizing.LoadPhotos(None).load(data).photos
+    accuracy = params.get("accuracy", 2500)
+    if params.get("seed") is not None:
+        accuracy = random.Random(params["seed"]).randint(accuracy // 2, accuracy * 3 // 2)  # Restarts vary the window too
+    slides, score = randomizing.slide_algo(randomizing.build_slides(photos, params.get("v_algo", 0), params.get("seed")),
+                                           accuracy=accuracy, checkpoint_file=params.get("checkpoint"),
+                                           resume=params.get("resume", False), deadline=params.get("deadline"))
+    return [(s.photoA.id, -1 if s.photoB is None else s.photoB.id) for s in slides], score
+
+
+def solve_oily_portraits(data: PhotoData, params: dict) -> Result:
+    import KCW_Fantastic4_oilyportraitsfinal_Team7 as oily
+    album = oily.solve(oily.create_photos(data), oily.hash_photos(data), pairing=params.get("pairing"),
+                       seed=params.get("seed"), lsh=params.get("lsh"))
+    return [(s.first, s.second) for s in album.slides], album.score
+
+
+SOLVERS = {
+    "example": solve_example,
+    "binary_landscapes": solve_binary_landscapes,
+    "computable_moments": solve_computable_moments,
+    "randomizing_paintings": solve_randomizing_paintings,
+    "oily_portraits": solve_oily_portraits,
+}
+
+# Solvers with randomized restarts: a "seed" parameter changes their start and tie-breaking
+SEEDED_SOLVERS = ("computable_moments", "randomizing_paintings", "oily_portraits")
+
+
+def part_params(params: dict, part: int, share: float) -> dict:
+    """Parameters of one component of a job: its own checkpoint file, and its share of the deadline."""
+    params = dict(params)
+    if params.get("checkpoint"):
+        root, ext = os.path.splitext(params["checkpoint"])
+        params["checkpoint"] = f"{root}.part{part}{ext}"
+    if params.get("deadline"):
+        params["deadline"] = params["deadline"] * share
+    return params
+
+
+def solve_components(solver: str, data: PhotoData, params: dict, min_size: int = MIN_COMPONENT) -> Result:
+    """Solve the tag components of the input apart, one after another, and concatenate their slideshows.
+
+    This trades score for time. Portraits are only paired within their
+    group, and a slide joining portraits from two components can score with
+    both, so the split run usually scores a little lower than the whole
+    input; what it saves is the search over candidates that share no tag.
+    Each part gets a deadline in proportion to its photos, and checkpoints
+    to its own file, so a resumed job resumes every part. The parts run in this process: a job is already one task
+    of the runner's pool, which keeps the CPUs busy.
+    """
+    parts = split_components(data, min_size)
+    inputs = (subset(data, rows) for rows in parts)
+    params = [part_params(params, k, len(rows) / max(len(data), 1)) for k, rows in enumerate(parts)]
+    slides = []
+    for rows, (part_slides, _) in zip(parts, map(SOLVERS[solver], inputs, params)):
+        slides.extend((int(rows[a]), -1 if b == -1 else int(rows[b])) for a, b in part_slides)
+    first = np.array([a for a, _ in slides], dtype=np.int64)
+    second = np.array([b for _, b in slides], dtype=np.int64)
+    return slides, score(data, first, second)
+
+
+def run_job(job: Dict, cache_root: str) -> Tuple[Result, float]:
+    """Worker process: solve one manifest entry. The input is already in the parse cache."""
+    start = time.time()
+    data = load_photos_cached(job["input"], cache_root)
+    if job.get("components"):
+        result = solve_components(job["solver"], data, job.get("params", {}), job.get("min_component", MIN_COMPONENT))
+    else:
+        result = SOLVERS[job["solver"]](data, job.get("params", {}))
+    return result, time.time() - start
+
+
+def write_slides(file_path: str, slides: List[Tuple[int, int]]):
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    lines = [f"{a} {b}" if b != -1 else f"{a}" for a, b in slides]
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(f"{len(lines)}\n")
+        f.write("\n".join(lines))
+        f.write("\n")
+    os.replace(tmp_path, file_path)
+
+
+def restart_params(job: Dict) -> List[Dict]:
+    """Parameters of each run of a job: the job's own, then one seeded variant per extra restart."""
+    params = job.get("params", {})
+    restarts = job.get("restarts", 1)
+    if restarts > 1 and job["solver"] not in SEEDED_SOLVERS:
+        raise ValueError(f"Solver {job['solver']!r} has no randomized restarts, expected one of {', '.join(SEEDED_SOLVERS)}")
+    seed = job.get("seed", 0)
+    runs = [params]
+    for k in range(1, restarts):
+        run = dict(params, seed=seed + k)
+        if params.get("checkpoint"):
+            # Each run logs and resumes its own ordering
+            root, ext = os.path.splitext(params["checkpoint"])
+            run["checkpoint"] = f"{root}.seed{seed + k}{ext}"
+        runs.append(run)
+    return runs
+
+
+def run_manifest(jobs: List[Dict], workers: int, cache_root: str = CACHE_ROOT) -> int:
+    """Solve every job of the manifest and return the total score.
+
+    Inputs are parsed into the binary cache one after another on a background
+    thread, and each job goes to the process pool as soon as its input is
+    ready, so the next input is parsed while earlier ones are solving. Outputs
+    are written on another background thread. The pool spawns its workers
+    rather than forking this process while those threads run.
+
+    A job with "restarts": N is a portfolio: its N runs (the plain one, then
+    seeds seed+1 .. seed+N-1) share the pool and the memory-mapped cache of
+    the input, and only the best result is kept. A job with "components": true
+    is split into its tag components first, solved by solve_components.
+    """
+    for job in jobs:
+        if job["solver"] not in SOLVERS:
+            raise ValueError(f"Unknown solver {job['solver']!r}, expected one of {', '.join(SOLVERS)}")
+    runs = [restart_params(job) for job in jobs]
+
+    total_score = 0
+    with ThreadPoolExecutor(1) as parser, ThreadPoolExecutor(1) as writer, \
+            ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parsed = [parser.submit(load_photos_cached, job["input"], cache_root) for job in jobs]
+        solving = {}
+        for index, (job, parse) in enumerate(zip(jobs, parsed)):
+            parse.result()
+            for run, params in enumerate(runs[index]):
+                solving[pool.submit(run_job, dict(job, params=params), cache_root)] = index, run
+        best = {}
+        pending = [len(job_runs) for job_runs in runs]
+        writes = []
+        for future in as_completed(solving):
+            index, run = solving[future]
+            (slides, score), elapsed = future.result()
+            job = jobs[index]
+            if len(runs[index]) > 1:
+                print(f"{job['input']}: run {run} scored {score} in {elapsed:.2f} seconds")
+            # Ties keep the lowest run, so the result does not depend on which run finished first
+            if index not in best or (score, -run) > (best[index][1], -best[index][2]):
+                best[index] = slides, score, run, elapsed
+            pending[index] -= 1
+            if pending[index]:
+                continue
+            slides, score, run, elapsed = best.pop(index)
+            total_score += score
+            print(f"{job['input']}: score {score} in {elapsed:.2f} seconds" + (f" (run {run})" if len(runs[index]) > 1 else ""))
+            writes.append(writer.submit(write_slides, job["output"], slides))
+        for write in writes:
+            write.result()
+    return total_score
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve several datasets in parallel from a JSON manifest.")
+    parser.add_argument("manifest", help='JSON list of {"input", "solver", "output", "params", "restarts", "seed", '
+                                         '"components", "min_component"} entries')
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="datasets solved at once")
+    parser.add_argument("--cache", default=CACHE_ROOT, help="parse cache directory")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    with open(args.manifest, "r") as f:
+        jobs = json.load(f)
+    total_score = run_manifest(jobs, args.jobs, args.cache)
+    print(f"\nTotal Execution Time: {time.time() - start_time:.2f} seconds")
+    print(f"Total Score: {total_score}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import sys
+import time
+import argparse
+import numpy as np
+from typing import List, Tuple
+from KCW_Fantastic4_loader_Team7 import PhotoData, load_photos
+
+
+def read_solution(file_path: str) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Slides of a solution file as (first photo, second photo or -1) arrays, plus the declared count."""
+    with open(file_path, "rb") as f:
+        lines = f.read().split(b"\n")
+    declared = int(lines[0])
+    slides = [line.split() for line in lines[1:] if line.strip()]
+    for k, ids in enumerate(slides):
+        if len(ids) > 2:
+            raise ValueError(f"Slide {k} has {len(ids)} photos")
+    first = np.fromiter((int(ids[0]) for ids in slides), dtype=np.int64, count=len(slides))
+    second = np.fromiter((int(ids[1]) if len(ids) > 1 else -1 for ids in slides), dtype=np.int64, count=len(slides))
+    return first, second, declared
+
+
+def validate(data: PhotoData, first: np.ndarray, second: np.ndarray, declared: int) -> List[str]:
+    """Everything that makes the solution illegal; empty when it is valid."""
+    errors = []
+    num_photos = len(data)
+    if declared != len(first):
+        errors.append(f"Header declares {declared} slides but the file has {len(first)}")
+    pair = second != -1
+    used = np.concatenate((first, second[pair]))
+    out_of_range = (used < 0) | (used >= num_photos)
+    if out_of_range.any():
+        errors.append(f"Photo ids out of range: {used[out_of_range][:10].tolist()}")
+        return errors
+    counts = np.bincount(used, minlength=num_photos)
+    if (counts > 1).any():
+        errors.append(f"Photos used more than once: {np.flatnonzero(counts > 1)[:10].tolist()}")
+    landscape = np.asarray(data.landscape)
+    single_portrait = ~pair & ~landscape[first]
+    if single_portrait.any():
+        errors.append(f"Portraits alone on a slide: {first[single_portrait][:10].tolist()}")
+    pair_landscape = pair & (landscape[first] | landscape[np.where(pair, second, 0)])
+    if pair_landscape.any():
+        errors.append(f"Slides pairing a landscape: {np.flatnonzero(pair_landscape)[:10].tolist()}")
+    return errors
+
+
+def score(data: PhotoData, first: np.ndarray, second: np.ndarray) -> int:
+    """Total interest of the slideshow, with every transition scored at once.
+
+    Each (slide, tag) pair becomes the key slide * num_tags + tag. Shifting the
+    keys of the next slide back by one slide, a transition's intersection is
+    the number of keys both sides share.
+    """
+    num_slides = len(first)
+    if num_slides < 2:
+        return 0
+    num_tags = max(len(data.tags), 1)
+    pair = np.flatnonzero(second != -1)
+    slide_of_first, tags_first = data.gather(first)
+    slide_of_second, tags_second = data.gather(second[pair])
+    keys = np.concatenate((slide_of_first * num_tags + tags_first, pair[slide_of_second] * num_tags + tags_second))
+    keys.sort()
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]  # A tag on both photos of a pair counts once
+    sizes = np.bincount(keys // num_tags, minlength=num_slides)
+    if data.private is not None:
+        sizes += data.private[first] + np.where(second != -1, data.private[second], 0)
+    slide = keys // num_tags
+    left = keys[slide < num_slides - 1]
+    right = keys[slide > 0] - num_tags
+    inter = np.bincount(np.intersect1d(left, right, assume_unique=True) // num_tags, minlength=num_slides - 1)
+    return int(np.minimum(np.minimum(inter, sizes[:-1] - inter), sizes[1:] - inter).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a solution file and compute its score.")
+    parser.add_argument("input", help="input photo file")
+    parser.add_argument("solution", help="solution file")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    data = load_photos(args.input)
+    try:
+        first, second, declared = read_solution(args.solution)
+    except (ValueError, IndexError, OverflowError) as error:
+        # A non-integer token, a missing header or an id too large for the arrays
+        print(f"INVALID: Malformed solution file: {error}")
+        sys.exit(1)
+    errors = validate(data, first, second, declared)
+    for error in errors:
+        print(f"INVALID: {error}")
+    if errors:
+        sys.exit(1)
+    print(f"Score: {score(data, first, second)}")
+    print(f"Checked {len(first)} slides in {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+from KCW_Fantastic4_metrics_Team7 import count
+
+
+def ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """The index ranges starts[i] .. starts[i] + lengths[i] - 1, concatenated."""
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)
+
+
+def row_offsets(row: np.ndarray, num_rows: int) -> np.ndarray:
+    """CSR offsets of items sorted by row, from the row of each item."""
+    offsets = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row, minlength=num_rows), out=offsets[1:])
+    return offsets
+
+
+class InterestScorer:
+    """Batch interest scoring over a sparse (row x tag) incidence matrix.
+
+    Rows are photos or slides, each given as a collection of distinct tags.
+    Scoring a slide against many rows is a single sparse mat-vec: the products
+    are the intersection counts, and with the row sizes they give
+    min(inter, a - inter, b - inter) for every row at once. Sizes are the
+    lengths of the collections.
+    """
+
+    def __init__(self, tag_lists: Iterable[Iterable[Hashable]], vocabulary: Optional[Dict[Hashable, int]] = None):
+        self.vocabulary = {} if vocabulary is None else vocabulary
+        indptr = [0]
+        indices = []
+        for tags in tag_lists:
+            for tag in tags:
+                tag_id = self.vocabulary.get(tag)
+                if tag_id is None:
+                    tag_id = self.vocabulary[tag] = len(self.vocabulary)
+                indices.append(tag_id)
+            indptr.append(len(indices))
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int32)
+        data = np.ones(len(indices), dtype=np.int32)
+        self.matrix = csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, len(self.vocabulary)))
+        self.sizes = np.diff(indptr).astype(np.int32)
+        self._vector = np.zeros(len(self.vocabulary), dtype=np.int32)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def _tag_ids(self, tags: Iterable[Hashable]) -> np.ndarray:
+        # Tags outside the vocabulary cannot intersect any row, they only count towards the size
+        return np.fromiter((self.vocabulary[tag] for tag in tags if tag in self.vocabulary), dtype=np.int64)
+
+    def intersections(self, tags: Iterable[Hashable], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Number of tags each row shares with `tags` (all rows, or only `rows`)."""
+        tag_ids = self._tag_ids(tags)
+        vector = self._vector
+        vector[tag_ids] = 1
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        counts = matrix @ vector
+        vector[tag_ids] = 0
+        return counts
+
+    def scores(self, tags, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Interest of the transition between a slide with `tags` and each row."""
+        inter = self.intersections(tags, rows)
+        count("interest_calls")
+        count("candidates_scanned", len(inter))
+        sizes = self.sizes if rows is None else self.sizes[rows]
+        return np.minimum(np.minimum(inter, len(tags) - inter), sizes - inter)
+
+    def union_scores(self, base_tags, tags, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Interest between `tags` and the union of `base_tags` with each row.
+
+        Used to pick the second portrait of a slide: the row is the candidate
+        partner, `base_tags` the first portrait and `tags` the neighbouring slide.
+        """
+        common = set(base_tags) & set(tags)
+        inter = len(common) + self.intersections(tags, rows) - self.intersections(common, rows)
+        sizes = self.sizes if rows is None else self.sizes[rows]
+        count("interest_calls")
+        count("candidates_scanned", len(sizes))
+        union_sizes = len(base_tags) + sizes - self.intersections(base_tags, rows)
+        return np.minimum(np.minimum(inter, union_sizes - inter), len(tags) - inter)
+
+    def best(self, tags, rows: Optional[np.ndarray] = None) -> Tuple[int, int]:
+        """(index, interest) of the best-scoring row; ties go to the first one."""
+        scores = self.scores(tags, rows)
+        index = int(np.argmax(scores))
+        return index, int(scores[index])
+
+
+class SizeBuckets:
+    """The alive rows of an InterestScorer bucketed by tag count, for a pruned greedy search.
+
+    Rows are kept sorted by tag count, so each bucket is a contiguous range.
+    A transition between slides with a and b tags scores at most
+    min(a, b) // 2: best() first scores the buckets with b >= a in ascending
+    chunks and stops once a row reaches their bound a // 2, then only the
+    smaller buckets whose bound can still match the best found. Dead rows are
+    compacted away once they are half of the pool.
+    """
+
+    def __init__(self, scorer: InterestScorer):
+        self.scorer = scorer
+        self._build(np.argsort(scorer.sizes, kind="stable"))
+
+    def _build(self, rows: np.ndarray):
+        self.rows = rows
+        self.sizes = self.scorer.sizes[rows]
+        self.matrix = self.scorer.matrix[rows]
+        self.alive = np.ones(len(rows), dtype=bool)
+        self.position = np.full(len(self.scorer), -1, dtype=np.int64)
+        self.position[rows] = np.arange(len(rows))
+        self.count = len(rows)
+
+    def __len__(self):
+        return self.count
+
+    def remove(self, row: int):
+        self.alive[self.position[row]] = False
+        self.count -= 1
+        if self.count <= len(self.rows) // 2:
+            self._build(self.rows[self.alive])
+
+    def _scan(self, vector: np.ndarray, size: int, lo: int, hi: int) -> Tuple[int, int]:
+        if hi <= lo:
+            return -1, -1
+        # A view on the rows of the range; slicing the matrix would copy them. The offsets
+        # take the dtype of the indices, or scipy would copy the indices to match them
+        matrix = self.matrix
+        start, end = matrix.indptr[lo], matrix.indptr[hi]
+        indptr = (matrix.indptr[lo:hi + 1] - start).astype(matrix.indices.dtype)
+        rows = csr_matrix((matrix.data[start:end], matrix.indices[start:end], indptr),
+                          shape=(hi - lo, matrix.shape[1]), copy=False)
+        inter = rows @ vector
+        count("interest_calls")
+        count("candidates_scanned", hi - lo)
+        scores = np.minimum(np.minimum(inter, size - inter), self.sizes[lo:hi] - inter)
+        scores[~self.alive[lo:hi]] = -1
+        best = int(np.argmax(scores))
+        return lo + best, int(scores[best])
+
+    def best(self, tags, chunk: int = 4096) -> Tuple[int, int]:
+        """(row, interest) of the best alive row, ties going to the fewest tags then the lowest row; (-1, -1) if none."""
+        size = len(tags)
+        tag_ids = self.scorer._tag_ids(tags)
+        vector = self.scorer._vector
+        vector[tag_ids] = 1
+        split = int(np.searchsorted(self.sizes, size))
+        # Rows with at least as many tags all have the bound size // 2: the scan goes up
+        # in growing chunks and stops at the first row reaching it, as ties go to the first
+        position, interest = -1, -1
+        start, step = split, chunk
+        while start < len(self.rows) and interest < size // 2:
+            chunk_position, chunk_interest = self._scan(vector, size, start, min(start + step, len(self.rows)))
+            if chunk_interest > interest:
+                position, interest = chunk_position, chunk_interest
+            start, step = start + step, 2 * step
+        # A smaller bucket can only tie or beat `interest` if it has at least 2 * interest tags
+        lo = int(np.searchsorted(self.sizes, 2 * max(interest, 0)))
+        small_position, small_interest = self._scan(vector, size, lo, split)
+        vector[tag_ids] = 0
+        if small_interest >= interest:
+            position, interest = small_position, small_interest
+        if position == -1 or interest == -1:
+            return -1, -1
+        return int(self.rows[position]), interest
+
+
+class NextSlideSearch:
+    """Next-slide search of the greedy builders over the rows not placed yet.
+
+    The exact search goes through SizeBuckets. With lsh = (bands, rows per
+    band), the rows sharing a MinHash bucket with the query are tried first.
+    """
+
+    def __init__(self, scorer: InterestScorer, lsh: Optional[Tuple[int, int]] = None):
+        self.buckets = SizeBuckets(scorer)
+        self.index = None
+        if lsh:
+            from KCW_Fantastic4_lsh_Team7 import MinHashIndex  # Imports this module
+            self.index = MinHashIndex(scorer, *lsh)
+        self.unplaced = np.ones(len(scorer), dtype=bool)
+
+    def remove(self, row: int):
+        self.unplaced[row] = False
+        self.buckets.remove(row)
+
+    def best(self, tags) -> Tuple[int, int]:
+        """(row, interest) of the best unplaced row, as SizeBuckets.best; an LSH hit may not be the best."""
+        if self.index is not None:
+            row, interest = self.index.best(tags, self.unplaced)
+            if row != -1:
+                return row, interest
+        # No bucket hit, or none of the hits scores: exact search
+        return self.buckets.best(tags)
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words: np.ndarray, out: np.ndarray) -> int:
+        return int(np.bitwise_count(words, out=out[:len(words)]).sum())
+
+    def _popcount_rows(bits: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray, out: np.ndarray) -> int:
+        return int(np.take(_POPCOUNT_TABLE, words.view(np.uint8), out=out[:words.nbytes]).sum())
+
+    def _popcount_rows(bits: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[bits.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+class BitsetStore:
+    """Packed tag bitsets, one row of uint64 words per photo or slide.
+
+    All rows live in a single contiguous matrix whose width is derived from the
+    number of distinct tags. Intersections are popcounts of the AND of two
+    rows, written into preallocated buffers so no call allocates an array.
+    `counts` are the tag counts of the rows, including the private tags folded
+    away by compact_tags, which set no bit.
+    """
+
+    def __init__(self, rows: int, num_tags: int):
+        self.words = max(1, (num_tags + 63) // 64)
+        self.bits = np.zeros((rows, self.words), dtype=np.uint64)
+        self.counts = np.zeros(rows, dtype=np.int64)
+        self._and = np.empty(self.words, dtype=np.uint64)
+        self._popcounts = np.empty(self.words * 8, dtype=np.uint8)
+
+    def __len__(self):
+        return self.bits.shape[0]
+
+    @classmethod
+    def from_csr(cls, offsets: np.ndarray, tag_ids: np.ndarray, num_tags: int,
+                 private: Optional[np.ndarray] = None) -> 'BitsetStore':
+        """Build every row at once from flat tag ids, row i being tag_ids[offsets[i]:offsets[i+1]] plus private[i] folded tags."""
+        store = cls(len(offsets) - 1, num_tags)
+        rows = np.repeat(np.arange(len(store)), np.diff(offsets))
+        tag_ids = np.asarray(tag_ids, dtype=np.uint64)
+        np.bitwise_or.at(store.bits, (rows, (tag_ids >> np.uint64(6)).astype(np.intp)),
+                         np.left_shift(np.uint64(1), tag_ids & np.uint64(63)))
+        store.counts[:] = _popcount_rows(store.bits)
+        if private is not None:
+            store.counts += private
+        return store
+
+    def intersection(self, first: int, second: int) -> int:
+        np.bitwise_and(self.bits[first], self.bits[second], out=self._and)
+        return _popcount(self._and, self._popcounts)
+
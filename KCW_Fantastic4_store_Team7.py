@@ -0,0 +1,107 @@
+import numpy as np
+from typing import List
+from KCW_Fantastic4_loader_Team7 import PhotoData
+from KCW_Fantastic4_scoring_Team7 import row_offsets
+
+
+class PhotoView:
+    """One photo of a PhotoData. Holds no data of its own, only the row it reads."""
+    __slots__ = ("data", "index")
+
+    def __init__(self, data: PhotoData, index: int):
+        self.data = data
+        self.index = index
+
+    @property
+    def landscape(self) -> bool:
+        return bool(self.data.landscape[self.index])
+
+    @property
+    def tag_ids(self) -> np.ndarray:
+        offsets = self.data.offsets
+        return self.data.tag_ids[offsets[self.index]:offsets[self.index + 1]]
+
+    @property
+    def tags(self) -> np.ndarray:
+        """The tag ids, as a view on the data's array; loops in Python should take tolist() once."""
+        return self.tag_ids
+
+    @property
+    def size(self) -> int:
+        """Tag count, with the tags folded away by compact_tags."""
+        offsets = self.data.offsets
+        size = int(offsets[self.index + 1] - offsets[self.index])
+        return size if self.data.private is None else size + int(self.data.private[self.index])
+
+
+def photo_views(data: PhotoData) -> List[PhotoView]:
+    return [PhotoView(data, i) for i in range(len(data))]
+
+
+class SlideStore:
+    """Slides in flat arrays: their photos, and the union of the photos' tags in CSR form.
+
+    Slide i shows photo first[i], and photo second[i] unless it is -1. Its
+    tag ids, sorted, are tag_ids[offsets[i]:offsets[i+1]].
+    """
+
+    def __init__(self, data: PhotoData, first: np.ndarray, second: np.ndarray):
+        self.data = data
+        self.first = np.asarray(first, dtype=np.int64)
+        self.second = np.asarray(second, dtype=np.int64)
+        pair = np.flatnonzero(self.second != -1)
+        slide_of_first, tags_first = data.gather(self.first)
+        slide_of_second, tags_second = data.gather(self.second[pair])
+        slide = np.concatenate((slide_of_first, pair[slide_of_second]))
+        tags = np.concatenate((tags_first, tags_second)).astype(np.int64)
+        keys = np.unique(slide * max(len(data.tags), 1) + tags)  # Sorted, and a tag on both photos counts once
+        slide = keys // max(len(data.tags), 1)
+        self.tag_ids = (keys - slide * max(len(data.tags), 1)).astype(np.int32)
+        self.offsets = row_offsets(slide, len(self.first))
+        # Folded tags are private, so a pair's counts add up
+        self.private = None
+        if data.private is not None:
+            self.private = data.private[self.first] + np.where(self.second != -1, data.private[self.second], 0)
+
+    def __len__(self):
+        return len(self.first)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        sizes = np.diff(self.offsets)
+        return sizes if self.private is None else sizes + self.private
+
+    def views(self) -> List['SlideView']:
+        return [SlideView(self, i) for i in range(len(self))]
+
+
+class SlideView:
+    """One slide of a SlideStore, read from its arrays."""
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: SlideStore, index: int):
+        self.store = store
+        self.index = index
+
+    @property
+    def first(self) -> int:
+        return int(self.store.first[self.index])
+
+    @property
+    def second(self) -> int:
+        return int(self.store.second[self.index])
+
+    @property
+    def tag_ids(self) -> np.ndarray:
+        offsets = self.store.offsets
+        return self.store.tag_ids[offsets[self.index]:offsets[self.index + 1]]
+
+    @property
+    def tags(self) -> np.ndarray:
+        return self.tag_ids
+
+    @property
+    def size(self) -> int:
+        offsets = self.store.offsets
+        size = int(offsets[self.index + 1] - offsets[self.index])
+        return size if self.store.private is None else size + int(self.store.private[self.index])
@@ -0,0 +1,92 @@
+import random
+from KCW_Fantastic4_ledger_Team7 import ScoreLedger
+
+
+def make_ledger(size=8, seed=0):
+    rng = random.Random(seed)
+    tags = [set(rng.sample(range(12), rng.randint(1, 6))) for _ in range(size)]
+
+    def points(a, b):
+        common = len(tags[a] & tags[b])
+        return min(common, len(tags[a]) - common, len(tags[b]) - common)
+
+    return ScoreLedger(size, points), points
+
+
+def full_score(ledger, points):
+    order = ledger.order
+    return sum(points(order[k], order[k + 1]) for k in range(len(order) - 1))
+
+
+def check(ledger, points):
+    assert ledger.total == full_score(ledger, points)
+    assert all(ledger.pos[slide] == position for position, slide in enumerate(ledger.order))
+
+
+def test_relocate_next_to_itself_is_a_no_op():
+    ledger, points = make_ledger()
+    for position in range(len(ledger)):
+        for after in (position - 1, position):
+            order, total = list(ledger.order), ledger.total
+            assert ledger.relocate_delta(position, after) == 0
+            ledger.relocate(position, after)
+            assert ledger.order == order and ledger.total == total
+            check(ledger, points)
+
+
+def test_move_in_place():
+    ledger, points = make_ledger()
+    for length in range(1, 4):
+        for start in range(len(ledger) - length + 1):
+            for after in range(start - 1, start + length):
+                order, total = list(ledger.order), ledger.total
+                assert ledger.move_delta(start, length, after) == 0
+                ledger.move(start, length, after)
+                assert ledger.order == order and ledger.total == total
+                # Reversed in place, the segment is simply reversed
+                delta = ledger.move_delta(start, length, after, reverse=True)
+                ledger.move(start, length, after, reverse=True)
+                assert ledger.order[start:start + length] == order[start:start + length][::-1]
+                assert ledger.total == total + delta
+                check(ledger, points)
+
+
+def test_swap_with_itself_is_a_no_op():
+    ledger, points = make_ledger()
+    for i in range(len(ledger)):
+        order, total = list(ledger.order), ledger.total
+        assert ledger.swap_delta(i, i) == 0
+        ledger.swap(i, i)
+        assert ledger.order == order and ledger.total == total
+        check(ledger, points)
+
+
+def test_deltas_match_applied_moves():
+    ledger, points = make_ledger(size=12, seed=1)
+    rng = random.Random(2)
+    for _ in range(500):
+        size = len(ledger)
+        kind = rng.choice(("move", "relocate", "swap", "reverse"))
+        total = ledger.total
+        if kind == "move":
+            length = rng.randint(1, 3)
+            start = rng.randrange(size - length + 1)
+            after = rng.randrange(-1, size)
+            reverse = rng.random() < 0.5
+            delta = ledger.move_delta(start, length, after, reverse)
+            ledger.move(start, length, after, reverse)
+        elif kind == "relocate":
+            position, after = rng.randrange(size), rng.randrange(-1, size)
+            delta = ledger.relocate_delta(position, after)
+            ledger.relocate(position, after)
+        elif kind == "swap":
+            i, j = rng.randrange(size), rng.randrange(size)
+            delta = ledger.swap_delta(i, j)
+            ledger.swap(i, j)
+        else:
+            left = rng.randrange(size)
+            right = rng.randrange(left, size)
+            delta = ledger.reverse_delta(left, right)
+            ledger.reverse(left, right)
+        assert ledger.total == total + delta, kind
+        check(ledger, points)